@@ -1,9 +1,23 @@
 from .api import *
 from .browser import *
+from .cache import *
+from .cassette import *
 from .cli import *
 from .db import *
 from .decorators import *
+from .grid import *
+from .har import *
+from .keyboard import *
+from .load import *
 from .mailer import *
+from .network import *
 from .notifier import *
+from .perflog import *
+from .performance import *
+from .scheduler import *
 from .screen_recorder import *
+from .timings import *
+from .token_cache import *
 from .utils import *
+from .waits import *
+from .websocket import *
@@ -1,30 +1,259 @@
+import asyncio
+import http.cookiejar
 import json
 import logging
+import threading
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pathlib import Path
 from datetime import datetime
+from time import sleep, perf_counter
+from OSGRMATT.cache import ResponseCache
+from OSGRMATT.cassette import Cassette
+from OSGRMATT.timings import request_timings
+from OSGRMATT.token_cache import TokenCache
+from OSGRMATT.utils import get_hash_generator
 
 logger = logging.getLogger(__name__)
 
 
 class APIBase:
-    """Base class for API"""
+    """
+    Base class for API.
+    Headers are per instance. For concurrent usage from several threads call enable_concurrent_mode():
+    every thread then works with its own copy of the instance headers (taken at first access in the thread),
+    so auth(), logout() and uploads in one thread don't affect requests in other threads.
+    """
     _BASE_DIR = Path(__file__).parent.parent.resolve()
-    _headers = {'accept': 'text/plain',
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.90 Safari/537.36',
-                'Content-Type': 'application/json-patch+json'}
+    _default_headers = {'accept': 'text/plain',
+                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.90 Safari/537.36',
+                        'Content-Type': 'application/json-patch+json'}
+    _thread_local_headers = False
+    # Connection pool / retry settings for the keep-alive session
+    _pool_connections = 10
+    _pool_maxsize = 10
+    _pool_block = False
+    _timeout = None
+    _retries = 0
+    _backoff_factor = 0
+    _retry_statuses = (502, 503, 504)
+    # Chunked upload settings
+    _upload_chunk_size = 8 * 1024 * 1024
+    _upload_retries = 3
+    _download_chunk_size = 1024 * 1024
+    _response_cache = None
+    _token_cache = None
+    _cached_auth = None
+    _cassette = None
+    _session_lock = threading.Lock()
+
+    @property
+    def _headers(self):
+        """Headers of this instance, or of current thread in concurrent mode"""
+        shared = self.__dict__.get('_shared_headers')
+        if shared is None:
+            shared = self.__dict__.setdefault('_shared_headers', dict(self._default_headers))
+        if not self._thread_local_headers:
+            return shared
+        local = self.__dict__.setdefault('_local_headers', threading.local())
+        headers = getattr(local, 'headers', None)
+        if headers is None:
+            headers = local.headers = dict(shared)
+        return headers
+
+    @_headers.setter
+    def _headers(self, value: dict):
+        if self._thread_local_headers:
+            self.__dict__.setdefault('_local_headers', threading.local()).headers = dict(value)
+        else:
+            self._shared_headers = dict(value)
 
     @property
     def headers(self):
         return self._headers
 
+    def enable_concurrent_mode(self):
+        """Give every thread its own copy of this instance headers"""
+        self._thread_local_headers = True
+
+    @property
+    def session(self):
+        """Pooled keep-alive session, created on first use"""
+        session = self.__dict__.get('_session')
+        if session is None:
+            with self._session_lock:
+                session = self.__dict__.get('_session')
+                if session is None:
+                    session = self._session = self._create_session()
+        return session
+
+    def configure_session(self,
+                          pool_connections: int = None,
+                          pool_maxsize: int = None,
+                          pool_block: bool = None,
+                          timeout=None,
+                          retries: int = None,
+                          backoff_factor: float = None,
+                          retry_statuses: tuple = None):
+        """
+        Configure connection pool, timeouts and retry policy. Current session is closed and recreated on next request.
+        :param pool_connections: int - number of per-host pools to cache
+        :param pool_maxsize: int - max keep-alive connections per host
+        :param pool_block: bool - block when pool is exhausted instead of opening extra connections
+        :param timeout: float or (connect, read) tuple
+        :param retries: int - retries for connection errors and retry_statuses (idempotent methods only)
+        :param backoff_factor: float - exponential backoff factor between retries
+        :param retry_statuses: tuple - response statuses to retry
+        """
+        settings = {'_pool_connections': pool_connections,
+                    '_pool_maxsize': pool_maxsize,
+                    '_pool_block': pool_block,
+                    '_timeout': timeout,
+                    '_retries': retries,
+                    '_backoff_factor': backoff_factor,
+                    '_retry_statuses': retry_statuses}
+        for key, value in settings.items():
+            if value is not None:
+                setattr(self, key, value)
+        self.close()
+
+    def _create_session(self):
+        """Create session with pooled adapter and retry policy"""
+        if self._retries:
+            retry = Retry(total=self._retries,
+                          backoff_factor=self._backoff_factor,
+                          status_forcelist=self._retry_statuses,
+                          raise_on_status=False)
+        else:
+            retry = 0
+        adapter = HTTPAdapter(pool_connections=self._pool_connections,
+                              pool_maxsize=self._pool_maxsize,
+                              pool_block=self._pool_block,
+                              max_retries=retry)
+        session = requests.Session()
+        # Cookies are not kept between requests, as with requests.get/post
+        session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        logger.info("Created HTTP session: pool %s/%s, timeout %s, retries %s",
+                    self._pool_connections, self._pool_maxsize, self._timeout, self._retries)
+        return session
+
+    def _request(self, method: str, url: str, **kwargs):
+        """Send request through pooled session"""
+        kwargs.setdefault('timeout', self._timeout)
+        cassette = self._cassette
+        if cassette is not None:
+            key = cassette.key(method, url, kwargs.get('data'), kwargs.get('files'), kwargs.get('headers'))
+            if cassette.replaying:
+                response = cassette.play(method, url, key=key)
+                if response is not None:
+                    return response
+        if not request_timings.enabled:
+            response = self.session.request(method, url, **kwargs)
+        else:
+            start = perf_counter()
+            response = self.session.request(method, url, **kwargs)
+            request_timings.record(method, url, response, perf_counter() - start, kwargs.get('stream', False))
+        if cassette is not None and cassette.recording:
+            cassette.record(method, url, response, key=key, stream=kwargs.get('stream', False))
+        if response.status_code == 401 and self._is_cached_token_rejected(url, kwargs.get('headers')):
+            return self._reauth(method, url, **kwargs)
+        return response
+
+    def _is_cached_token_rejected(self, url: str, headers: dict):
+        """401 is for the token from token cache, not for login request or other credentials"""
+        if self._cached_auth is None:
+            return False
+        auth_url, _, _, _, token = self._cached_auth
+        return url != auth_url and (headers or {}).get('Authorization') == token
+
+    def _reauth(self, method: str, url: str, **kwargs):
+        """Cached token was rejected: drop it from cache, login again and repeat request once"""
+        auth_url, email, password, token_key, token = self._cached_auth
+        self._cached_auth = None
+        logger.warning("Url: %s %s 401 with cached token, re-auth", url, method)
+        self._token_cache.invalidate(auth_url, email, token)
+        self.auth(auth_url, email, password, token_key)
+        if kwargs.get('headers') is not None:
+            kwargs['headers'] = dict(kwargs['headers'], Authorization=self.headers['Authorization'])
+        cached_auth, self._cached_auth = self._cached_auth, None
+        try:
+            return self._request(method, url, **kwargs)
+        finally:
+            self._cached_auth = cached_auth
+
+    def use_cassette(self, cassette: Cassette = None):
+        """
+        Record or replay requests with cassette, None to switch off. Cassette is saved on close()
+        :param cassette: Cassette
+        :return: Cassette
+        """
+        self._cassette = cassette
+        return cassette
+
+    def enable_token_cache(self, cache: TokenCache = None):
+        """
+        Take auth() tokens from cache shared by tests and worker processes, re-auth on 401
+        :param cache: TokenCache - default cache in temp dir
+        :return: TokenCache
+        """
+        self._token_cache = cache or TokenCache()
+        return self._token_cache
+
+    def enable_cache(self, cache: ResponseCache = None):
+        """
+        Cache responses of _get with ETag/Last-Modified revalidation. Pass the same cache
+        to several instances to share it.
+        :param cache: ResponseCache - default new in-memory cache
+        :return: ResponseCache
+        """
+        self._response_cache = cache or ResponseCache()
+        return self._response_cache
+
+    def _cached_get(self, url: str):
+        """GET through response cache"""
+        cache = self._response_cache
+        key = cache.make_key(url, self.headers)
+        entry, fresh = cache.lookup(key)
+        if fresh:
+            logger.info("Url: %s served from cache", url)
+            return cache.to_response(entry, url)
+        headers = dict(self.headers, **cache.conditional_headers(entry))
+        response = self._request('GET', url, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            cache.revalidated(key, entry, response)
+            logger.info("Url: %s revalidated", url)
+            return cache.to_response(entry, url)
+        cache.store(key, response)
+        return response
+
+    def close(self):
+        """Close pooled session and its keep-alive connections"""
+        if self._response_cache is not None:
+            self._response_cache.save()
+        if self._cassette is not None:
+            self._cassette.save()
+        session = self.__dict__.pop('_session', None)
+        if session is not None:
+            session.close()
+            logger.info("HTTP session closed")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     @property
     def base_dir(self):
         return self._BASE_DIR
 
     def _post(self, url: str, body, return_error: bool = False, return_file: bool = False):
         """POST request impl"""
-        response = requests.post(url, data=body, headers=self.headers)
+        response = self._request('POST', url, data=body, headers=self.headers)
         if response.status_code == 200:
             if return_file is True:
                 return response.content
@@ -41,7 +270,10 @@ class APIBase:
 
     def _get(self, url: str, return_error: bool = False, return_file: bool = False):
         """GET request impl"""
-        response = requests.get(url, headers=self.headers)
+        if self._response_cache is not None:
+            response = self._cached_get(url)
+        else:
+            response = self._request('GET', url, headers=self.headers)
         if response.status_code == 200:
             if return_file is True:
                 return response.content
@@ -57,7 +289,7 @@ class APIBase:
                 raise ValueError(f'{url} - {response.status_code}: {response.content}')
 
     def _delete(self, url: str, data: json = None, return_error: bool = False):
-        response = requests.delete(url=url, data=data, headers=self.headers)
+        response = self._request('DELETE', url, data=data, headers=self.headers)
         if response.status_code == 200:
             return json.loads(response.content)
         else:
@@ -71,7 +303,7 @@ class APIBase:
 
     def _put(self, url: str, body: json, return_error: bool = False):
         """PUT request impl"""
-        response = requests.put(url, data=body, headers=self.headers)
+        response = self._request('PUT', url, data=body, headers=self.headers)
         if response.status_code == 200:
             return json.loads(response.content)
         else:
@@ -83,8 +315,11 @@ class APIBase:
                 logger.error("Url: %s PUT Error %s: %s", url, response.status_code, response.content)
                 raise ValueError(f'{url} - {response.status_code}: {response.content}')
 
-    def _send_file(self, url: str, file_name: str, return_error: bool = False):
-        """Send file impl"""
+    def _send_file(self, url: str, file_name: str, return_error: bool = False, chunk_size: int = None,
+                   resume: bool = True):
+        """Send file impl. With chunk_size the file is streamed by chunks, see _send_file_chunked"""
+        if chunk_size:
+            return self._send_file_chunked(url, file_name, chunk_size, return_error, resume)
         file = Path(f'{self.base_dir}/test_data/{file_name}')
         self._headers['X-File-Size-From'] = '0'
         self._headers['X-File-Size'] = str(file.stat().st_size)
@@ -93,7 +328,7 @@ class APIBase:
             logger.info("File name: %s", file.name)
             send_data = {'file': (file_name, data, 'multipart/form-data')}
             logger.info("Request headers: %s", self.headers)
-            response = requests.post(url, files=send_data, headers=self.headers)
+            response = self._request('POST', url, files=send_data, headers=self.headers)
             if response.status_code == 200:
                 return json.loads(response.content)
             else:
@@ -106,6 +341,110 @@ class APIBase:
                     logger.error("Url: %s POST Error %s: %s", url, response.status_code, response.content)
                     raise ValueError(f'{url} - {response.status_code}: {response.content}')
 
+    def _send_file_chunked(self, url: str, file_name: str, chunk_size: int = None, return_error: bool = False,
+                           resume: bool = True):
+        """
+        Streaming upload: only one chunk is kept in memory.
+        Every chunk is posted with X-File-Size-From = chunk offset and X-File-Size = full file size.
+        Failed chunk is resent from the last acknowledged offset up to _upload_retries times.
+        Acknowledged offset is kept per (url, file), so a next call with resume=True continues from it.
+        :param url: str
+        :param file_name: str - file in test_data dir
+        :param chunk_size: int - bytes per request, default _upload_chunk_size
+        :param return_error: bool
+        :param resume: bool - continue from last acknowledged offset of previous failed upload
+        :return: json of last chunk response
+        """
+        chunk_size = chunk_size or self._upload_chunk_size
+        file = Path(f'{self.base_dir}/test_data/{file_name}')
+        file_size = file.stat().st_size
+        offsets = self.__dict__.setdefault('_upload_offsets', {})
+        key = (url, str(file))
+        offset = offsets.get(key, 0) if resume else 0
+        if offset:
+            logger.info("Resume upload of %s from offset %s", file.name, offset)
+        self._headers['X-File-Size'] = str(file_size)
+        attempt = 0
+        with open(file, 'rb') as send_file:
+            while True:
+                send_file.seek(offset)
+                chunk = send_file.read(chunk_size)
+                self._headers['X-File-Size-From'] = str(offset)
+                send_data = {'file': (file_name, chunk, 'multipart/form-data')}
+                try:
+                    response = self._request('POST', url, files=send_data, headers=self.headers)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if attempt >= self._upload_retries:
+                        raise
+                    response = None
+                    logger.warning("Url: %s chunk %s-%s error: %s", url, offset, offset + len(chunk), e)
+                if response is not None and response.status_code == 200:
+                    offset += len(chunk)
+                    offsets[key] = offset
+                    attempt = 0
+                    logger.info("Uploaded %s/%s bytes of %s", offset, file_size, file.name)
+                    if offset >= file_size:
+                        offsets.pop(key, None)
+                        return json.loads(response.content)
+                    continue
+                if response is not None and attempt >= self._upload_retries:
+                    if return_error is True:
+                        error = self._handle_error(response)
+                        logger.error("Url: %s SEND FILE/POST Error %s: %s", url, response.status_code, error)
+                        return f'{url} - {response.status_code}: {error}'
+                    else:
+                        logger.error("Url: %s POST Error %s: %s", url, response.status_code, response.content)
+                        raise ValueError(f'{url} - {response.status_code}: {response.content}')
+                attempt += 1
+                logger.warning("Retry chunk from offset %s, attempt %s", offset, attempt)
+                sleep(self._backoff_factor * (2 ** (attempt - 1)))
+
+    def _download(self, url: str, target, body=None, method: str = 'GET', algorithm: str = None,
+                  chunk_size: int = None, return_error: bool = False):
+        """
+        Streaming download: response body is written to target by chunks, not buffered in memory.
+        :param url: str
+        :param target: str/Path of file or file-like object with write()
+        :param body: request body for POST
+        :param method: str - GET or POST
+        :param algorithm: str - hashlib algorithm (as in utils.to_hash) to hash data on the fly
+        :param chunk_size: int - default _download_chunk_size
+        :param return_error: bool
+        :return: dict with size, seconds, bytes_per_sec and hash
+        """
+        chunk_size = chunk_size or self._download_chunk_size
+        hash_generator = get_hash_generator(algorithm) if algorithm else None
+        start = perf_counter()
+        response = self._request(method, url, data=body, headers=self.headers, stream=True)
+        with response:
+            if response.status_code != 200:
+                if return_error is True:
+                    error = self._handle_error(response)
+                    logger.error("Url: %s DOWNLOAD Error %s: %s", url, response.status_code, error)
+                    return f'{url} - {response.status_code}: {error}'
+                else:
+                    logger.error("Url: %s DOWNLOAD Error %s: %s", url, response.status_code, response.content)
+                    raise ValueError(f'{url} - {response.status_code}: {response.content}')
+            size = 0
+            file = open(target, 'wb') if isinstance(target, (str, Path)) else target
+            try:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    file.write(chunk)
+                    size += len(chunk)
+                    if hash_generator:
+                        hash_generator.update(chunk)
+            finally:
+                if file is not target:
+                    file.close()
+        seconds = perf_counter() - start
+        result = {'size': size,
+                  'seconds': seconds,
+                  'bytes_per_sec': size / seconds if seconds else 0,
+                  'hash': hash_generator.hexdigest() if hash_generator else None}
+        logger.info("Downloaded %s bytes from %s in %.3f s (%.0f bytes/sec)",
+                    size, url, seconds, result['bytes_per_sec'])
+        return result
+
     def _handle_error(self, response):
         """Errors handler"""
         try:
@@ -144,12 +483,202 @@ class APIBase:
         return int((t2 - t1).total_seconds())
 
     def auth(self, auth_url: str, email: str, password: str, token_key: str):
-        """Auth method"""
+        """Auth method. With enabled token cache login is done only if there is no valid cached token"""
+        if self._token_cache is None:
+            token = self._login(auth_url, email, password, token_key)
+        else:
+            token, _ = self._token_cache.get_or_fetch(
+                auth_url, email, lambda: self._login(auth_url, email, password, token_key))
+            self._cached_auth = (auth_url, email, password, token_key, token)
+        self._headers['Authorization'] = token
+
+    def _login(self, auth_url: str, email: str, password: str, token_key: str):
+        """Login request, returns bearer token"""
         logger.info("Try to auth with acc %s & password %s", email, password)
         body = {"email": email, "password": password}
         response = self._post(auth_url, json.dumps(body))
         self._to_json('auth.json', response)
         logger.info("Token: %s", response[token_key])
+        if 'Bearer' in response[token_key]:
+            return response[token_key]
+        else:
+            return f"Bearer {response[token_key]}"
+
+    def logout(self):
+        """Logout method"""
+        try:
+            self._headers.pop('Authorization')
+            logger.info("Logout success!")
+        except KeyError:
+            logger.warning("You wasn't logged in!")
+
+
+class AsyncAPIBase:
+    """Asyncio counterpart of APIBase for concurrent requests"""
+    _BASE_DIR = APIBase._BASE_DIR
+    _headers = dict(APIBase._default_headers)
+    # Connector / retry settings, same meaning as in APIBase
+    _pool_maxsize = 100
+    _pool_per_host = 10
+    _timeout = None
+    _retries = 0
+    _backoff_factor = 0
+    _retry_statuses = (502, 503, 504)
+    _retry_methods = Retry.DEFAULT_ALLOWED_METHODS
+    _concurrency = 10
+
+    def __init__(self, pool_maxsize: int = None, pool_per_host: int = None, timeout: float = None,
+                 retries: int = None, backoff_factor: float = None, concurrency: int = None):
+        self._headers = dict(self._headers)
+        self._session = None
+        settings = {'_pool_maxsize': pool_maxsize,
+                    '_pool_per_host': pool_per_host,
+                    '_timeout': timeout,
+                    '_retries': retries,
+                    '_backoff_factor': backoff_factor,
+                    '_concurrency': concurrency}
+        for key, value in settings.items():
+            if value is not None:
+                setattr(self, key, value)
+
+    @property
+    def headers(self):
+        return self._headers
+
+    @property
+    def base_dir(self):
+        return self._BASE_DIR
+
+    @property
+    def session(self):
+        """aiohttp session, created on first use inside running loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._pool_maxsize, limit_per_host=self._pool_per_host)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self._timeout),
+                                                  cookie_jar=aiohttp.DummyCookieJar())
+        return self._session
+
+    async def _request(self, method: str, url: str, data_factory=None, retry: bool = None, **kwargs):
+        """
+        Send request, return (status, content). Retries connection errors and retry statuses
+        :param data_factory: callable returning fresh request data for every attempt (streams, FormData)
+        :param retry: bool - retry this request, default only for idempotent methods (as in APIBase)
+        """
+        kwargs.setdefault('headers', self.headers)
+        retries = self._retries if (method in self._retry_methods if retry is None else retry) else 0
+        attempt = 0
+        while True:
+            if data_factory is not None:
+                kwargs['data'] = data_factory()
+            try:
+                async with self.session.request(method, url, **kwargs) as response:
+                    content = await response.read()
+                    status = response.status
+            except aiohttp.ClientConnectionError:
+                if attempt >= retries:
+                    raise
+            else:
+                if status not in self._retry_statuses or attempt >= retries:
+                    return status, content
+            attempt += 1
+            delay = self._backoff_factor * (2 ** (attempt - 1))
+            logger.warning("Url: %s %s retry %s in %s s", url, method, attempt, delay)
+            await asyncio.sleep(delay)
+
+    def _process_response(self, method: str, url: str, status: int, content: bytes,
+                          return_error: bool = False, return_file: bool = False):
+        """Same response semantics as APIBase"""
+        if status == 200:
+            if return_file is True:
+                return content
+            else:
+                return json.loads(content)
+        else:
+            if return_error is True:
+                error = self._handle_error(content)
+                logger.error("Url: %s %s Error %s: %s", url, method, status, error)
+                return f'{url} - {status}: {error}'
+            else:
+                logger.error("Url: %s %s Error %s: %s", url, method, status, content)
+                raise ValueError(f'{url} - {status}: {content}')
+
+    def _handle_error(self, content: bytes):
+        """Errors handler"""
+        try:
+            return json.loads(content)
+        except json.decoder.JSONDecodeError:
+            return content
+
+    async def post(self, url: str, body, return_error: bool = False, return_file: bool = False,
+                   retry: bool = False):
+        """POST request impl. retry=True retries it like idempotent requests"""
+        status, content = await self._request('POST', url, data=body, retry=retry)
+        return self._process_response('POST', url, status, content, return_error, return_file)
+
+    async def get(self, url: str, return_error: bool = False, return_file: bool = False):
+        """GET request impl"""
+        status, content = await self._request('GET', url)
+        return self._process_response('GET', url, status, content, return_error, return_file)
+
+    async def delete(self, url: str, data: json = None, return_error: bool = False):
+        """DELETE request impl"""
+        status, content = await self._request('DELETE', url, data=data)
+        return self._process_response('DELETE', url, status, content, return_error)
+
+    async def put(self, url: str, body: json, return_error: bool = False):
+        """PUT request impl"""
+        status, content = await self._request('PUT', url, data=body)
+        return self._process_response('PUT', url, status, content, return_error)
+
+    async def send_file(self, url: str, file_name: str, return_error: bool = False, retry: bool = False):
+        """
+        Send file impl. Upload headers are set per request, shared headers stay untouched.
+        retry=True retries the upload like idempotent requests
+        """
+        file = Path(f'{self.base_dir}/test_data/{file_name}')
+        headers = {key: value for key, value in self.headers.items() if key not in ('accept', 'Content-Type')}
+        headers['X-File-Size-From'] = '0'
+        headers['X-File-Size'] = str(file.stat().st_size)
+        logger.info("File name: %s", file.name)
+        # aiohttp closes the file after sending, so every attempt gets new FormData over new file object
+        opened = []
+
+        def form_data():
+            opened.append(open(file, 'rb'))
+            data = aiohttp.FormData()
+            data.add_field('file', opened[-1], filename=file_name, content_type='multipart/form-data')
+            return data
+
+        try:
+            status, content = await self._request('POST', url, data_factory=form_data, retry=retry, headers=headers)
+        finally:
+            for send_file in opened:
+                send_file.close()
+        return self._process_response('SEND FILE/POST', url, status, content, return_error)
+
+    async def gather(self, *requests_, limit: int = None, return_exceptions: bool = False):
+        """
+        Run request coroutines concurrently, at most limit at once
+        :param requests_: coroutines, e.g. api.get(url)
+        :param limit: int - concurrency limit, default _concurrency
+        :param return_exceptions: bool - return exceptions instead of raising the first one
+        :return: list of results in the same order
+        """
+        semaphore = asyncio.Semaphore(limit or self._concurrency)
+
+        async def bounded(request):
+            async with semaphore:
+                return await request
+
+        return await asyncio.gather(*(bounded(request) for request in requests_),
+                                    return_exceptions=return_exceptions)
+
+    async def auth(self, auth_url: str, email: str, password: str, token_key: str):
+        """Auth method"""
+        logger.info("Try to auth with acc %s", email)
+        body = {"email": email, "password": password}
+        response = await self.post(auth_url, json.dumps(body))
         if 'Bearer' in response[token_key]:
             token = response[token_key]
         else:
@@ -163,3 +692,15 @@ class APIBase:
             logger.info("Logout success!")
         except KeyError:
             logger.warning("You wasn't logged in!")
+
+    async def close(self):
+        """Close session and its connections"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
@@ -1,19 +1,30 @@
+import json
+import os
 import shutil
+import threading
+from contextlib import contextmanager
 from pathlib import Path
+from urllib.parse import urlsplit
 from selenium import webdriver
 from selenium.common import SessionNotCreatedException
 from selenium.webdriver.chrome.options import Options as Chromeoptions
 from selenium.webdriver.remote.file_detector import FileDetector
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager, ChromeType
-from time import sleep
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from webdriver_manager.core.os_manager import OperationSystemManager
+from time import sleep, perf_counter
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException, WebDriverException
+from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.action_chains import ActionChains
+from OSGRMATT.grid import GridClient
+from OSGRMATT.keyboard import CDPKeyboard, CTRL
+from OSGRMATT.network import apply_network_profile
+from OSGRMATT.perflog import get_collector
+from OSGRMATT.performance import PagePerformance
 from OSGRMATT.utils import get_used_memory
+from OSGRMATT.waits import JS_INSPECT, WaitEngine, WaitPolicy
 
 import logging
 
@@ -27,6 +38,97 @@ def get_download_dir():
     return base_dir / "tmp/downloads"
 
 
+_DRIVER_CACHE_FILE = Path.home() / '.wdm' / 'osgrmatt_drivers.json'
+_resolved_drivers = {}
+_chrome_version = []
+driver_resolution_stats = {'calls': 0, 'seconds': 0.0, 'last': 0.0, 'network': 0}
+_driver_resolutions = []
+_driver_resolutions_lock = threading.Lock()
+
+
+def get_chrome_version():
+    """Версия установленного Chrome, определяется один раз за процесс. Неудачное определение повторяется"""
+    if not _chrome_version:
+        version = OperationSystemManager().get_browser_version_from_os(ChromeType.GOOGLE)
+        if not version:
+            return 'unknown'
+        _chrome_version.append(version)
+    return _chrome_version[0]
+
+
+def pop_driver_resolutions():
+    """Резолвы chromedriver с прошлого вызова для отчета теста: [{'seconds': ..., 'source': ...}]"""
+    with _driver_resolutions_lock:
+        records = _driver_resolutions[:]
+        _driver_resolutions.clear()
+    return records
+
+
+def resolve_chromedriver(offline: bool = None, cache_file: Path = _DRIVER_CACHE_FILE):
+    """
+    Путь к chromedriver для установленной версии Chrome.
+    Путь кэшируется в процессе и в cache_file между запусками, ChromeDriverManager вызывается только
+    для новой версии Chrome. Если версию Chrome определить не удалось, путь в файл не сохраняется.
+    В offline режиме (или OSGRMATT_DRIVER_OFFLINE=1) сеть не используется:
+    берется CHROMEDRIVER_PATH, кэш или chromedriver из PATH.
+    """
+    start = perf_counter()
+    if offline is None:
+        offline = os.getenv('OSGRMATT_DRIVER_OFFLINE') == '1'
+    path = os.getenv('CHROMEDRIVER_PATH')
+    source = 'env'
+    if not path:
+        version = get_chrome_version()
+        known = version != 'unknown'
+        path = _resolved_drivers.get(version) if known else None
+        source = 'memory'
+        if not path and known:
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as file:
+                    path = json.load(file).get(version)
+            except (OSError, json.decoder.JSONDecodeError):
+                path = None
+            if path and not Path(path).exists():
+                path = None
+            source = 'file'
+        if not path and offline:
+            path = shutil.which('chromedriver')
+            source = 'path'
+            if not path:
+                raise FileNotFoundError(f"Offline mode: no cached chromedriver for Chrome {version}")
+        if not path:
+            path = ChromeDriverManager(chrome_type=ChromeType.GOOGLE).install()
+            source = 'network'
+            driver_resolution_stats['network'] += 1
+            if known:
+                _save_driver_path(cache_file, version, path)
+        if known:
+            _resolved_drivers[version] = path
+    elapsed = perf_counter() - start
+    driver_resolution_stats['calls'] += 1
+    driver_resolution_stats['seconds'] += elapsed
+    driver_resolution_stats['last'] = elapsed
+    with _driver_resolutions_lock:
+        _driver_resolutions.append({'seconds': elapsed, 'source': source})
+    logger.info("Chromedriver resolved in %.3f s (%s): %s", elapsed, source, path)
+    return path
+
+
+def _save_driver_path(cache_file: Path, version: str, path: str):
+    """Сохраняет путь к драйверу версии Chrome в файл кэша"""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+    except (OSError, json.decoder.JSONDecodeError):
+        data = {}
+    data[version] = path
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = cache_file.with_name(f'{cache_file.name}.{os.getpid()}.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as file:
+        json.dump(data, file)
+    os.replace(tmp_file, cache_file)
+
+
 class LocalFileDetector(FileDetector):
     """Класс отвечает за скачивание и загрузку локальных файлов при использовании ноды грида. Не используется."""
     def is_available(self):
@@ -44,6 +146,9 @@ class LocalFileDetector(FileDetector):
 
 
 class Browser:
+    # 'cloud:options' capability for Grid sessions, set in subclass or pass to setup_driver
+    _cloud_options = None
+
     def setup_options(self,
                       arguments: list = None,
                       experimental_options: list = None,
@@ -63,10 +168,23 @@ class Browser:
 
         return options
 
-    def setup_driver(self, options: Chromeoptions = None, command_executor: str = None):
+    def setup_driver(self, options: Chromeoptions = None, command_executor: str = None, offline: bool = None,
+                     cloud_options: dict = None, grid_client: GridClient = None, network_profile=None):
+        """
+        :param options: Chromeoptions
+        :param command_executor: str - Grid url, local Chrome if not set
+        :param offline: bool - resolve local chromedriver without network
+        :param cloud_options: dict - 'cloud:options' capability for Grid, default _cloud_options (none)
+        :param grid_client: GridClient - wait for free Grid slot before session request
+        :param network_profile: name from NETWORK_PROFILES ('lean', 'slow_3g', 'lean+slow_3g'...) or dict,
+                                enables performance log for per-test network profile stats
+        """
         logger.info("Setup driver")
         if options is None:
             options = Chromeoptions()
+        if network_profile:
+            logging_prefs = dict(options.capabilities.get('goog:loggingPrefs') or {}, performance='ALL')
+            options.set_capability('goog:loggingPrefs', logging_prefs)
         if command_executor:
             options.add_argument('--headless')
             options.add_argument('-lang=ru')
@@ -75,11 +193,16 @@ class Browser:
             https://www.selenium.dev/documentation/webdriver/drivers/remote_webdriver/#enable-downloads-in-the-grid
             options.enable_downloads = True
             """
-            cloud_options = {'build': "build_3",
-                             'name': "test_abc3",
-                             "browserVersion": "120.0.6099.130"}
-            logger.info("Cloud options: %s", cloud_options)
-            options.set_capability('cloud:options', cloud_options)
+            cloud_options = self._cloud_options if cloud_options is None else cloud_options
+            if cloud_options:
+                logger.info("Cloud options: %s", cloud_options)
+                options.set_capability('cloud:options', cloud_options)
+            if grid_client:
+                stereotype = grid_client.acquire_slot(options.capabilities.get('browserName', 'chrome'))
+                if stereotype.get('browserVersion') and not options.browser_version:
+                    options.browser_version = stereotype['browserVersion']
+                if stereotype.get('platformName') and not options.platform_name:
+                    options.platform_name = stereotype['platformName']
             try:
                 driver = webdriver.Remote(command_executor=command_executor,
                                           options=options)
@@ -87,75 +210,344 @@ class Browser:
                 logger.error("Create session error: %s", e.msg)
                 logger.error("Create session error stacktrace: %s", e.stacktrace)
                 raise TypeError("Driver creation error: %s", e.msg)
+            finally:
+                if grid_client:
+                    grid_client.session_started()
         else:
-            service = Service(ChromeDriverManager(chrome_type=ChromeType.GOOGLE).install())
+            service = Service(resolve_chromedriver(offline))
             driver = webdriver.Chrome(service=service, options=options)
+        apply_network_profile(driver, network_profile)
 
         return driver
 
 
+class DriverPool:
+    """
+    Pool of warmed driver sessions reused between tests.
+    Released driver is reset: test tabs are replaced by new blank tab, cookies are cleared and storages of
+    every origin visited by the test are cleared through CDP (current page storages only without CDP).
+    Broken or used max_reuse times driver is quit and replaced on next acquire.
+    """
+    _STORAGE_TYPES = 'local_storage,indexeddb,websql,cache_storage,service_workers,file_systems'
+
+    def __init__(self, factory=None, max_size: int = 1, max_reuse: int = 50):
+        """
+        :param factory: callable without args returning new driver, default Browser().setup_driver
+        :param max_size: int - max drivers alive at once
+        :param max_reuse: int - tests per driver before it's recycled
+        """
+        self._factory = factory or Browser().setup_driver
+        self._max_size = max_size
+        self._max_reuse = max_reuse
+        self._idle = []
+        self._uses = {}
+        self._size = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: float = None):
+        """Get healthy driver from pool, create new one if pool isn't full"""
+        while True:
+            with self._condition:
+                if not self._condition.wait_for(lambda: self._idle or self._size < self._max_size, timeout):
+                    raise TimeoutException("No free driver in pool")
+                driver = self._idle.pop() if self._idle else None
+                if driver is None:
+                    self._size += 1
+            if driver is None:
+                try:
+                    driver = self._factory()
+                except Exception:
+                    self._discard(None)
+                    raise
+                self._uses[id(driver)] = 0
+                logger.info("Pool: new driver %s", driver.session_id)
+                return driver
+            if self.is_healthy(driver):
+                return driver
+            logger.warning("Pool: driver %s is broken, recycle", driver.session_id)
+            self._discard(driver)
+
+    def release(self, driver, broken: bool = False):
+        """Return driver to pool"""
+        uses = self._uses.get(id(driver), 0) + 1
+        self._uses[id(driver)] = uses
+        if broken or uses >= self._max_reuse or not self.reset(driver):
+            logger.info("Pool: recycle driver %s after %s uses", driver.session_id, uses)
+            self._discard(driver)
+            return
+        with self._condition:
+            self._idle.append(driver)
+            self._condition.notify()
+
+    @contextmanager
+    def driver(self, timeout: float = None):
+        """with pool.driver() as driver: ..."""
+        driver = self.acquire(timeout)
+        broken = False
+        try:
+            yield driver
+        except WebDriverException:
+            broken = not self.is_healthy(driver)
+            raise
+        finally:
+            self.release(driver, broken)
+
+    def is_healthy(self, driver):
+        try:
+            driver.execute_script("return 1;")
+            return True
+        except WebDriverException:
+            return False
+
+    def _visited_origins(self, driver, handles: list):
+        """
+        Origins from navigation history of driver tabs and Document requests of performance log
+        (frames, closed tabs) if it's enabled. None if driver doesn't support CDP
+        """
+        urls = []
+        try:
+            for handle in handles:
+                driver.switch_to.window(handle)
+                urls += [entry['url'] for entry in driver.execute_cdp_cmd('Page.getNavigationHistory', {})['entries']]
+        except (AttributeError, WebDriverException):
+            return None
+        try:
+            urls += [event['params']['request']['url']
+                     for event in get_collector(driver).read('driver_pool', 'Network.requestWillBeSent')
+                     if event['params'].get('type') == 'Document']
+        except WebDriverException:
+            pass
+        origins = set()
+        for url in urls:
+            parts = urlsplit(url)
+            if parts.scheme in ('http', 'https') and parts.netloc:
+                origins.add(f'{parts.scheme}://{parts.netloc}')
+        return origins
+
+    def reset(self, driver):
+        """Reset driver state between tests. Returns False if driver can't be reset"""
+        try:
+            handles = driver.window_handles
+            origins = self._visited_origins(driver, handles)
+            if origins is None:
+                driver.switch_to.window(handles[0])
+                driver.execute_script("try {window.localStorage.clear(); window.sessionStorage.clear();} catch (e) {}")
+            # sessionStorage lives in the tab, so the test tabs are replaced by new one
+            driver.switch_to.new_window('tab')
+            blank = driver.current_window_handle
+            for handle in handles:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(blank)
+            for origin in origins or ():
+                driver.execute_cdp_cmd('Storage.clearDataForOrigin',
+                                       {'origin': origin, 'storageTypes': self._STORAGE_TYPES})
+            if origins:
+                logger.info("Pool: storages cleared for %s", ', '.join(sorted(origins)))
+            try:
+                driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            except (AttributeError, WebDriverException):
+                driver.delete_all_cookies()
+            return True
+        except WebDriverException as e:
+            logger.warning("Pool: driver reset error: %s", e)
+            return False
+
+    def _discard(self, driver):
+        if driver is not None:
+            self._uses.pop(id(driver), None)
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def close(self):
+        """Quit all idle drivers"""
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._discard(driver)
+
+
+class CachedElement(WebElement):
+    """Element from SeleniumLogic element cache, re-resolves its locator after StaleElementReferenceException"""
+    def __init__(self, logic, by, value, element: WebElement):
+        super().__init__(element.parent, element.id)
+        self._logic = logic
+        self._locator = (by, value)
+
+    def _refresh(self):
+        self._logic.element_cache_stats['stale'] += 1
+        logger.info("Element %s is stale, find again", self._locator)
+        self._id = self._logic.wait_for('presence', *self._locator).id
+
+    def _retry_stale(self, method, *args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        except StaleElementReferenceException:
+            self._refresh()
+            return method(*args, **kwargs)
+
+    def _execute(self, command, params=None):
+        return self._retry_stale(super()._execute, command, params)
+
+    def get_attribute(self, name):
+        return self._retry_stale(super().get_attribute, name)
+
+    def is_displayed(self):
+        return self._retry_stale(super().is_displayed)
+
+
 class SeleniumLogic:
-    def __init__(self, driver):
+    def __init__(self, driver, wait_policy: WaitPolicy = None, delay_profile=None):
+        """
+        :param driver: webdriver
+        :param wait_policy: WaitPolicy - timeouts of waits
+        :param delay_profile: default keystroke delays of enter_text_by_letter, see CDPKeyboard
+        """
         self.driver = driver
+        self.waits = WaitEngine(driver, wait_policy)
+        self.keyboard = CDPKeyboard(driver, delay_profile)
+        self._element_cache = None
+        self._element_cache_url = None
+        self._check_url = False
+        self.element_cache_stats = {'hits': 0, 'misses': 0, 'stale': 0}
+        self.performance = None
+
+    def enable_element_cache(self, check_url: bool = False):
+        """
+        Cache elements found by find_element* per locator. Stale cached element is found again transparently.
+        Cache is cleared by open_url/refresh/ctrl_f5, with check_url also when current url changes
+        (costs one driver call per lookup).
+        """
+        self._element_cache = {}
+        self._check_url = check_url
+
+    def invalidate_element_cache(self):
+        if self._element_cache:
+            self._element_cache.clear()
+
+    def _find_cached(self, by, value, timeout=None):
+        """Presence wait through element cache"""
+        if self._element_cache is None:
+            return self.wait_for('presence', by, value, timeout)
+        if self._check_url:
+            url = self.driver.current_url
+            if url != self._element_cache_url:
+                self._element_cache.clear()
+                self._element_cache_url = url
+        element = self._element_cache.get((by, value))
+        if element is not None:
+            self.element_cache_stats['hits'] += 1
+            return element
+        self.element_cache_stats['misses'] += 1
+        element = CachedElement(self, by, value, self.wait_for('presence', by, value, timeout))
+        self._element_cache[(by, value)] = element
+        return element
+
+    def open_url(self, url: str):
+        self.invalidate_element_cache()
+        self.driver.get(url)
+        if self.performance is not None:
+            self.performance.sample(url)
+
+    def enable_performance_metrics(self, budgets: dict = None, fail_fast: bool = True):
+        """
+        Collect page performance metrics after open_url and mark_performance steps, see PagePerformance
+        :param budgets: dict - e.g. {'lcp': 2500, 'cls': 0.1, 'js_heap_mb': 200}
+        :param fail_fast: bool - fail on the step which exceeds budget
+        """
+        self.performance = PagePerformance(self.driver, budgets, fail_fast)
+        return self.performance
+
+    def mark_performance(self, step: str):
+        """Collect page performance metrics for step"""
+        return self.performance.sample(step)
+
+    def refresh(self):
+        self.invalidate_element_cache()
+        self.driver.refresh()
+
+    def wait_for(self, condition: str, by, value, timeout=None):
+        """Wait for condition, timeout in seconds or WaitPolicy name. See WaitEngine.until"""
+        return self.waits.until(condition, by, value, timeout)
 
     def click_element(self, by, value):
-        WebDriverWait(self.driver, 30).until(EC.element_to_be_clickable((by, value))).click()
+        self.wait_for('clickable', by, value).click()
 
     def click_element_fast(self, by, value):
-        WebDriverWait(self.driver, 3).until(EC.element_to_be_clickable((by, value))).click()
+        self.wait_for('clickable', by, value, 'short').click()
 
     def enter_text(self, by, value, text):
-        element = WebDriverWait(self.driver, 30).until(EC.visibility_of_element_located((by, value)))
+        element = self.wait_for('visibility', by, value)
         element.clear()
         element.send_keys(text)
 
-    def enter_text_by_letter(self, by, value, text):
-        element = WebDriverWait(self.driver, 30).until(EC.visibility_of_element_located((by, value)))
+    def enter_text_by_letter(self, by, value, text, delay_profile=None):
+        """Type text with key events for every letter. CDP keyboard on Chromium, WebDriver otherwise"""
+        element = self.wait_for('visibility', by, value)
         element.clear()
-        for i in text:
+        if self.keyboard.available:
+            self.driver.execute_script("arguments[0].focus();", element)
+            self.keyboard.type_text(text, delay_profile)
+            return
+        for i, delay in zip(text, self.keyboard.delays(text, delay_profile)):
             element.send_keys(i)
-            sleep(0.25)
+            if delay:
+                sleep(delay)
+
+    def insert_text(self, by, value, text):
+        """Insert whole text in one CDP call (no key events), send_keys on non-Chromium browsers"""
+        element = self.wait_for('visibility', by, value)
+        if self.keyboard.available:
+            self.driver.execute_script("arguments[0].focus();", element)
+            self.keyboard.insert_text(text)
+        else:
+            element.send_keys(text)
 
     def enter_text_in_hidden_input(self, by, value, text):
         """Enter path for upload file"""
-        element = WebDriverWait(self.driver, 30).until(EC.presence_of_element_located((by, value)))
+        element = self.wait_for('presence', by, value)
         element.send_keys(text)
 
     def find_element_fast(self, by, value):
-        return WebDriverWait(self.driver, 5).until(EC.presence_of_element_located((by, value)))
+        return self._find_cached(by, value, 'fast')
 
     def find_element(self, by, value):
-        return WebDriverWait(self.driver, 30).until(EC.presence_of_element_located((by, value)))
+        return self._find_cached(by, value)
 
     def find_element_slow(self, by, value):
-        return WebDriverWait(self.driver, 180).until(EC.presence_of_element_located((by, value)))
+        return self._find_cached(by, value, 'slow')
 
     def find_elements(self, by, value):
         """find all presence elements with same locator"""
-        return WebDriverWait(self.driver, 30).until(EC.presence_of_all_elements_located((by, value)))
+        return self.wait_for('all_presence', by, value)
 
     def find_visible_elements(self, by, value):
         """find all visible elements with same locator"""
-        return WebDriverWait(self.driver, 30).until(EC.visibility_of_all_elements_located((by, value)))
+        return self.wait_for('all_visibility', by, value)
 
     def find_element_instantly(self, by, value):
         return self.driver.find_element(by, value)
 
     def check_visible_element(self, by, value):
-        return WebDriverWait(self.driver, 30).until(EC.visibility_of_element_located((by, value)))
+        return self.wait_for('visibility', by, value)
 
     def check_visible_fast(self, by, value):
-        return WebDriverWait(self.driver, 1).until(EC.visibility_of_element_located((by, value)))
+        return self.wait_for('visibility', by, value, 'instant')
 
     def wait_invisibility_of_element(self, by, value):
         try:
-            WebDriverWait(self.driver, 30).until(EC.invisibility_of_element_located((by, value)))
+            self.wait_for('invisibility', by, value)
         except TimeoutException:
             return 'need more TO'
 
     def wait_invisibility_of_element_slow(self, by, value):
         try:
-            WebDriverWait(self.driver, 180).until(EC.invisibility_of_element_located((by, value)))
+            self.wait_for('invisibility', by, value, 'slow')
         except TimeoutException:
             return 'need more TO'
 
@@ -176,8 +568,33 @@ class SeleniumLogic:
         alert = self.find_element_slow(by, value).text
         return alert
 
+    def inspect_elements(self, locators: list, attributes: list = None):
+        """
+        Presence, visibility, text and attributes of many elements in one driver call, without waiting
+        :param locators: list of (By, value), e.g. [(By.ID, 'login'), (By.XPATH, '//button')]
+        :param attributes: list of attribute names to read
+        :return: list of dicts present, visible, count, text, attributes, element - in locators order
+        """
+        return self.driver.execute_script(JS_INSPECT, [list(locator) for locator in locators], attributes or [])
+
     def press_escape(self):
-        ActionChains(self.driver).send_keys(Keys.ESCAPE).perform()
+        if self.keyboard.available:
+            self.keyboard.press('Escape')
+        else:
+            ActionChains(self.driver).send_keys(Keys.ESCAPE).perform()
+
+    def press_keys(self, key: str, modifiers: int = 0):
+        """Key chord on focused element through CDP, e.g. press_keys('a', CTRL). Chromium only"""
+        self.keyboard.press(key, modifiers)
+
+    def select_all_and_delete(self):
+        """Ctrl+A, Backspace on focused element"""
+        if self.keyboard.available:
+            self.keyboard.press('a', CTRL)
+            self.keyboard.press('Backspace')
+        else:
+            ActionChains(self.driver).key_down(Keys.CONTROL).send_keys('a').key_up(Keys.CONTROL) \
+                .send_keys(Keys.BACKSPACE).perform()
 
     def click_element_parametrized(self, contains_text: str):
         dialog_xpath = f"//*[contains(text(), '{contains_text}')]"
@@ -190,7 +607,11 @@ class SeleniumLogic:
         return self.driver.execute_script("return window.localStorage.getItem('token');")
 
     def ctrl_f5(self):
-        ActionChains(self.driver).key_down(Keys.CONTROL).send_keys(Keys.F5).key_up(Keys.CONTROL).perform()
+        self.invalidate_element_cache()
+        if self.keyboard.available:
+            self.keyboard.hard_reload()
+        else:
+            ActionChains(self.driver).key_down(Keys.CONTROL).send_keys(Keys.F5).key_up(Keys.CONTROL).perform()
 
     def get_used_memory(self):
         used_memory = get_used_memory(self.driver)
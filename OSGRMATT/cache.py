@@ -0,0 +1,180 @@
+import base64
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from time import time
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    LRU cache for GET responses.
+    Entry is fresh while Cache-Control max-age is not expired, after that it is revalidated with
+    If-None-Match / If-Modified-Since, and 304 response is served from cache.
+    Vary headers are hashed in the key and credential response headers (Set-Cookie...) are not stored,
+    so tokens don't get into the persisted file. Bodies are stored as is.
+    """
+    _CREDENTIAL_HEADERS = frozenset(('set-cookie', 'set-cookie2', 'authorization', 'proxy-authorization',
+                                     'www-authenticate', 'proxy-authenticate', 'x-auth-token', 'x-csrf-token'))
+
+    def __init__(self, max_entries: int = 256, path: str = None, vary_headers: tuple = ('accept', 'Authorization'),
+                 max_bytes: int = 64 * 1024 * 1024):
+        """
+        :param max_entries: int - LRU size
+        :param path: str - json file to persist cache between runs
+        :param vary_headers: tuple - request headers which are part of the cache key
+        :param max_bytes: int - max total size of cached bodies
+        """
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._path = Path(path) if path else None
+        self._vary_headers = vary_headers
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        if self._path and self._path.exists():
+            self.load()
+
+    @property
+    def stats(self):
+        return {'hits': self.hits,
+                'revalidations': self.revalidations,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._bytes}
+
+    def make_key(self, url: str, headers: dict):
+        vary = '&'.join(f'{name}={headers.get(name, "")}' for name in self._vary_headers)
+        return f'{url}|{hashlib.sha256(vary.encode()).hexdigest()}'
+
+    def lookup(self, key: str):
+        """Return (entry, fresh). Entry is None on miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            fresh = entry['expires'] > time()
+            if fresh:
+                self.hits += 1
+        return entry, fresh
+
+    def conditional_headers(self, entry: dict):
+        """Revalidation headers for stale entry"""
+        headers = {}
+        if entry is None:
+            return headers
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def revalidated(self, key: str, entry: dict, response: requests.Response):
+        """Entry confirmed by 304, refresh its lifetime"""
+        with self._lock:
+            self.revalidations += 1
+            entry['expires'] = time() + self._max_age(response.headers)
+            self._add(key, entry)
+
+    def store(self, key: str, response: requests.Response):
+        """Store 200 response if it's cacheable. Stale entry replaced by refetch is counted as miss"""
+        with self._lock:
+            stale = self._entries.pop(key, None)
+            if stale is not None:
+                self.misses += 1
+                self._bytes -= len(stale['content'])
+        cache_control = response.headers.get('Cache-Control', '').lower()
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        max_age = self._max_age(response.headers)
+        if response.status_code != 200 or 'no-store' in cache_control:
+            return
+        if not (etag or last_modified or max_age) or len(response.content) > self._max_bytes:
+            return
+        entry = {'status': response.status_code,
+                 'headers': self._safe_headers(response.headers),
+                 'content': response.content,
+                 'etag': etag,
+                 'last_modified': last_modified,
+                 'expires': time() + max_age}
+        with self._lock:
+            self._add(key, entry)
+
+    def _safe_headers(self, headers):
+        """Response headers without credentials"""
+        return {name: value for name, value in headers.items() if name.lower() not in self._CREDENTIAL_HEADERS}
+
+    def _add(self, key: str, entry: dict):
+        """Add entry and evict least recently used ones over max_entries/max_bytes, under lock"""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old['content'])
+        self._entries[key] = entry
+        self._bytes += len(entry['content'])
+        while len(self._entries) > self._max_entries or self._bytes > self._max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted['content'])
+
+    def to_response(self, entry: dict, url: str):
+        """Build requests.Response from cache entry"""
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.headers.update(entry['headers'])
+        response._content = entry['content']
+        response.url = url
+        return response
+
+    def _max_age(self, headers):
+        cache_control = headers.get('Cache-Control', '').lower()
+        if 'no-cache' in cache_control:
+            return 0
+        for directive in cache_control.split(','):
+            name, _, value = directive.strip().partition('=')
+            if name == 'max-age':
+                try:
+                    return int(value)
+                except ValueError:
+                    return 0
+        return 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def save(self):
+        """Persist cache to path"""
+        if self._path is None:
+            return
+        with self._lock:
+            data = {key: dict(entry, content=base64.b64encode(entry['content']).decode())
+                    for key, entry in self._entries.items()}
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._path, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        logger.info("Response cache saved to %s: %s", self._path, self.stats)
+
+    def load(self):
+        """Load cache from path"""
+        try:
+            with open(self._path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, json.decoder.JSONDecodeError) as e:
+            logger.warning("Response cache load error: %s", e)
+            return
+        with self._lock:
+            for key, entry in list(data.items())[-self._max_entries:]:
+                entry['content'] = base64.b64decode(entry['content'])
+                entry['headers'] = self._safe_headers(entry['headers'])
+                self._add(key, entry)
+        logger.info("Response cache loaded from %s: %s entries", self._path, len(self._entries))
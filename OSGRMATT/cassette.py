@@ -0,0 +1,161 @@
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from urllib.parse import urlencode
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class CassetteMissError(Exception):
+    ...
+
+
+class Cassette:
+    """
+    Recorded request/response pairs for offline API test runs. Stored as gzipped json lines.
+    Modes:
+    record - requests go to network, responses are recorded and saved on save()
+    replay - responses are served from cassette only, unknown request raises CassetteMissError
+    replay_passthrough - responses are served from cassette, unknown request goes to network
+    """
+    RECORD = 'record'
+    REPLAY = 'replay'
+    REPLAY_PASSTHROUGH = 'replay_passthrough'
+
+    def __init__(self, path: str, mode: str = REPLAY, match_headers: tuple = ()):
+        """
+        :param path: str - cassette file
+        :param mode: str - record, replay or replay_passthrough
+        :param match_headers: tuple - request headers which are part of the match key
+        """
+        if mode not in (self.RECORD, self.REPLAY, self.REPLAY_PASSTHROUGH):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self._path = Path(path)
+        self._mode = mode
+        self._match_headers = match_headers
+        self._index = {}
+        self._cursors = {}
+        self._lock = threading.Lock()
+        if mode != self.RECORD:
+            self.load()
+
+    @property
+    def recording(self):
+        return self._mode == self.RECORD
+
+    @property
+    def replaying(self):
+        return self._mode != self.RECORD
+
+    def _body_bytes(self, value):
+        """Request body or file part as bytes, the same way requests sends it"""
+        if value is None:
+            return b''
+        if isinstance(value, str):
+            return value.encode()
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value)
+        if isinstance(value, Mapping):
+            return urlencode(sorted(value.items()), doseq=True).encode()
+        if isinstance(value, (list, tuple)) and all(isinstance(item, tuple) and len(item) == 2 for item in value):
+            return urlencode(value, doseq=True).encode()
+        if hasattr(value, 'read') and hasattr(value, 'seek'):
+            position = value.tell()
+            content = value.read()
+            value.seek(position)
+            return self._body_bytes(content)
+        raise TypeError(f"Cassette can't match request body of type {type(value).__name__}: "
+                        f"use str, bytes, mapping, list of pairs or seekable file")
+
+    def key(self, method: str, url: str, data=None, files=None, headers: dict = None):
+        """
+        Match key: method, url, body hash and match headers.
+        Take it before sending request: file bodies are read to the end by requests.
+        """
+        body_hash = hashlib.sha1()
+        body_hash.update(self._body_bytes(data))
+        parts = files.items() if isinstance(files, Mapping) else files or []
+        for name, file in sorted(parts, key=lambda part: part[0]):
+            body_hash.update(name.encode())
+            for part in file[:2] if isinstance(file, tuple) else (file,):
+                body_hash.update(self._body_bytes(part))
+        vary = '&'.join(f'{name}={(headers or {}).get(name, "")}' for name in self._match_headers)
+        return f'{method.upper()} {url} {body_hash.hexdigest()} {vary}'
+
+    def play(self, method: str, url: str, data=None, files=None, headers: dict = None, key: str = None):
+        """Recorded response or None in passthrough mode. Repeated requests get recorded responses in order"""
+        key = key or self.key(method, url, data, files, headers)
+        with self._lock:
+            interactions = self._index.get(key)
+            if not interactions:
+                if self._mode == self.REPLAY:
+                    raise CassetteMissError(f"No recorded response for {method} {url} in {self._path}")
+                logger.info("Cassette miss, pass through: %s %s", method, url)
+                return None
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            interaction = interactions[min(cursor, len(interactions) - 1)]
+        response = requests.Response()
+        response.status_code = interaction['status']
+        response.headers.update(interaction['headers'])
+        response._content = base64.b64decode(interaction['content'])
+        response._content_consumed = True
+        response.url = url
+        return response
+
+    def record(self, method: str, url: str, response: requests.Response, data=None, files=None,
+               headers: dict = None, key: str = None, stream: bool = False):
+        """
+        Record response. Streamed response body isn't read here: it's recorded from the chunks
+        the caller reads with iter_content, when the body is read to the end
+        """
+        key = key or self.key(method, url, data, files, headers)
+        interaction = {'key': key,
+                       'status': response.status_code,
+                       'headers': dict(response.headers)}
+        if not stream:
+            self._add(interaction, response.content)
+            return
+        iter_content = response.iter_content
+
+        def recording_iter_content(*args, **kwargs):
+            chunks = []
+            for chunk in iter_content(*args, **kwargs):
+                chunks.append(chunk)
+                yield chunk
+            self._add(interaction, b''.join(chunk.encode() if isinstance(chunk, str) else chunk
+                                            for chunk in chunks))
+
+        response.iter_content = recording_iter_content
+
+    def _add(self, interaction: dict, content: bytes):
+        interaction['content'] = base64.b64encode(content).decode()
+        with self._lock:
+            self._index.setdefault(interaction['key'], []).append(interaction)
+
+    def load(self):
+        if not self._path.exists():
+            logger.warning("Cassette %s not found", self._path)
+            return
+        with gzip.open(self._path, 'rt', encoding='utf-8') as file:
+            for line in file:
+                interaction = json.loads(line)
+                self._index.setdefault(interaction['key'], []).append(interaction)
+        logger.info("Cassette %s loaded: %s requests", self._path, len(self._index))
+
+    def save(self):
+        """Write recorded interactions, only in record mode"""
+        if not self.recording:
+            return
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, gzip.open(self._path, 'wt', encoding='utf-8') as file:
+            for interactions in self._index.values():
+                for interaction in interactions:
+                    file.write(json.dumps(interaction) + '\n')
+        logger.info("Cassette %s saved: %s requests", self._path, len(self._index))
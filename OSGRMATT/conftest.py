@@ -1,5 +1,13 @@
 import pytest
+import re
+from OSGRMATT.browser import Browser, DriverPool, pop_driver_resolutions
+from OSGRMATT.cassette import Cassette
+from OSGRMATT.har import HarWriter
+from OSGRMATT.load import LoadRunner
+from OSGRMATT.network import log_network_profile_stats, profiled_drivers
 from OSGRMATT.notifier import NotifySender
+from OSGRMATT.performance import page_metrics, performance_to_html
+from OSGRMATT.timings import request_timings
 from datetime import datetime
 from bs4 import BeautifulSoup
 import json
@@ -12,6 +20,12 @@ def pytest_addoption(parser):
     """Добавление опции отправки уведомлений в ТГ"""
     parser.addoption("--send-notifies", action="store_true", default=False, help="Enable Telegram Notifies")
     parser.addoption("--screencast", action="store_true", default=False, help="Enable Screencast Writing")
+    parser.addoption("--api-timings", action="store_true", default=False, help="Enable API Request Timings")
+    parser.addoption("--cassette-mode", action="store", default=None,
+                     choices=(Cassette.RECORD, Cassette.REPLAY, Cassette.REPLAY_PASSTHROUGH),
+                     help="Record or replay API requests with cassettes")
+    parser.addoption("--har", action="store_true", default=False,
+                     help="Write network traffic of pooled drivers to HAR file per test")
 
 
 def check_notifies(config):
@@ -39,6 +53,142 @@ def pytest_configure(config):
     alluredir = getattr(config.option, "allure_report_dir", None)
     if not alluredir:
         setattr(config.option, "allure_report_dir", f"{base_dir}/html_reports/'")
+    request_timings.enabled = config.getoption("--api-timings")
+
+
+performance_key = pytest.StashKey[dict]()
+
+
+def pytest_runtest_setup(item):
+    """Сброс таймингов API запросов перед тестом"""
+    if request_timings.enabled:
+        request_timings.clear()
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_teardown(item):
+    """Статистика сетевых профилей теста (заблокированные запросы, загружено байт)
+    до тирдауна фикстур, пока драйверы живы"""
+    for driver in profiled_drivers():
+        try:
+            stats = log_network_profile_stats(driver)
+        except Exception:
+            continue
+        if stats['blocked'] or stats['loaded_bytes']:
+            item.user_properties.append(('network_profile_stats', stats))
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """Добавляет в pytest-html отчет таблицу таймингов API запросов, метрики производительности страниц
+    и время поиска chromedriver для драйверов, созданных тестом"""
+    outcome = yield
+    report = outcome.get_result()
+    if report.when != 'call':
+        return
+    pytest_html = item.config.pluginmanager.getplugin('html')
+    extras = getattr(report, 'extras', [])
+    if request_timings.enabled:
+        records = request_timings.pop()
+        if records and pytest_html:
+            extras.append(pytest_html.extras.html(request_timings.to_html(records)))
+    performance = page_metrics.pop()
+    if performance:
+        item.config.stash.setdefault(performance_key, {})[item.nodeid] = performance
+        if pytest_html:
+            extras.append(pytest_html.extras.html(performance_to_html(performance)))
+    resolutions = pop_driver_resolutions()
+    if resolutions and pytest_html:
+        items = ', '.join(f"{record['seconds'] * 1000:.1f} ms ({record['source']})" for record in resolutions)
+        extras.append(pytest_html.extras.html(f'<p>Chromedriver resolution: {items}</p>'))
+    report.extras = extras
+
+
+def pytest_sessionfinish(session):
+    """Сохраняет метрики производительности страниц рядом с html отчетом"""
+    performance = session.config.stash.get(performance_key, None)
+    report_path = getattr(session.config.option, 'htmlpath', None)
+    if performance and report_path:
+        with open(f'{Path(report_path).with_suffix("")}_performance.json', 'w', encoding='utf-8') as file:
+            json.dump(performance, file, indent=2)
+
+
+@pytest.fixture(scope="session")
+def driver_pool(request):
+    """Пул драйверов на всю сессию. Для своих опций переопределите фикстуру:
+    DriverPool(factory=lambda: Browser().setup_driver(options, command_executor)).
+    С --har драйверы создаются с performance логом"""
+    def performance_log_driver():
+        browser = Browser()
+        options = browser.setup_options(capabilities=[{'goog:loggingPrefs': {'performance': 'ALL'}}])
+        return browser.setup_driver(options)
+
+    pool = DriverPool(performance_log_driver if request.config.getoption("--har") else None)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def har_writer(request):
+    """Фабрика HAR записи теста: har_writer(driver) пишет трафик драйвера в html_reports/har/<test>.har.gz
+    по ходу теста (performance лог читается в фоне), файл закрывается после теста.
+    Драйвер должен быть создан с goog:loggingPrefs performance"""
+    base_dir = Path(__file__).parent.resolve()
+    name = re.sub(r'[^\w.-]', '_', request.node.nodeid)
+    writers = []
+
+    def start(driver, **kwargs):
+        suffix = f'_{len(writers)}' if writers else ''
+        path = f'{base_dir}/html_reports/har/{name}{suffix}.har.gz'
+        writers.append(HarWriter(driver, path, **kwargs))
+        request.node.user_properties.append(('har', path))
+        return writers[-1]
+
+    yield start
+    for writer in writers:
+        writer.close()
+
+
+@pytest.fixture
+def pooled_driver(request, driver_pool):
+    """Драйвер из пула, после теста сбрасывается и возвращается в пул. С --har трафик теста пишется в HAR"""
+    with driver_pool.driver() as driver:
+        if request.config.getoption("--har"):
+            har_writer = request.getfixturevalue('har_writer')
+            with har_writer(driver):
+                yield driver
+        else:
+            yield driver
+
+
+@pytest.fixture
+def load_runner(request):
+    """Фабрика нагрузочного прогона: load_runner(target, duration=..., concurrency=..., rps=...).
+    Результат сохраняется в html_reports/load_<test>.json, бюджеты проверяются через result.assert_budget()"""
+    base_dir = Path(__file__).parent.resolve()
+
+    def run(target, **kwargs):
+        kwargs.setdefault('name', re.sub(r'[^\w.-]', '_', request.node.name))
+        result = LoadRunner(target, **kwargs).run()
+        result.to_json(f'{base_dir}/html_reports/load_{result.name}.json')
+        return result
+
+    return run
+
+
+@pytest.fixture
+def cassette(request):
+    """Кассета теста cassettes/<test>.jsonl.gz в режиме --cassette-mode, None если режим не задан.
+    Подключается к API через api.use_cassette(cassette), сохраняется после теста"""
+    mode = request.config.getoption("--cassette-mode")
+    if mode is None:
+        yield None
+        return
+    base_dir = Path(__file__).parent.resolve()
+    name = re.sub(r'[^\w.-]', '_', request.node.nodeid)
+    test_cassette = Cassette(f"{base_dir}/cassettes/{name}.jsonl.gz", mode)
+    yield test_cassette
+    test_cassette.save()
 
 
 def pytest_unconfigure(config):
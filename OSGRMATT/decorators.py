@@ -1,7 +1,9 @@
-import json
 from functools import wraps
-from time import sleep
 import logging
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from OSGRMATT.performance import HeapSampler
+from OSGRMATT.websocket import WebSocketCapture
 
 logger = logging.getLogger(__name__)
 
@@ -12,9 +14,10 @@ def work_in_new_tab(func):
     def switch(*args, **kwargs):
         current_handle = args[0].driver.current_window_handle
         logger.info("Current handle: %s", current_handle)
+        handles_count = len(args[0].driver.window_handles)
         args[0].driver.execute_script("window.open();")
+        WebDriverWait(args[0].driver, 3, poll_frequency=0.05).until(EC.number_of_windows_to_be(handles_count + 1))
         args[0].driver.switch_to.window(args[0].driver.window_handles[-1])
-        sleep(3)
 
         res = func(*args, **kwargs)
 
@@ -45,18 +48,40 @@ def fix_used_memory(func):
     return fix_memory
 
 
+def sample_used_memory(func=None, interval: float = 0.5, leak_threshold: float = 1.0, min_span: float = 30,
+                       min_growth: float = 1.0):
+    """usedJSHeapSize and DOM nodes sampled during method run: peak, mean and growth trend to log.
+    Test fails if heap (after GC) grows faster than leak_threshold MB/min and by more than min_growth MB
+    over at least min_span seconds of sampling.
+    @sample_used_memory or @sample_used_memory(interval=0.2, leak_threshold=2)"""
+    def decorator(method):
+        @wraps(method)
+        def sample_memory(*args, **kwargs):
+            sampler = HeapSampler(args[0].driver, interval=interval, leak_threshold=leak_threshold,
+                                  min_span=min_span, min_growth=min_growth)
+            with sampler:
+                res = method(*args, **kwargs)
+            logger.info("Method %s memory: %s", method.__name__, sampler.stats())
+            sampler.check()
+
+            return res
+
+        return sample_memory
+
+    return decorator(func) if func is not None else decorator
+
+
 def check_socket_data(func):
-    """Get socket data from Network DevTools tab"""
+    """Get socket data from Network DevTools tab: frames and throughput by socket to log"""
     @wraps(func)
     def check_socket(*args, **kwargs):
-        res = func(*args, **kwargs)
-        for websocket_data in args[0].driver.get_log('performance'):
-            ws_json = json.loads((websocket_data['message']))
-            if ws_json["message"]["method"] == "Network.webSocketFrameReceived":
-                logger.info("Received socket message: %s", str(ws_json["message"]["params"]["timestamp"]) +
-                            ws_json["message"]["params"]["response"]["payloadData"])
-            if ws_json["message"]["method"] == "Network.webSocketFrameSent":
-                logger.info("Sent socket message: %s", ws_json["message"]["params"]["response"]["payloadData"])
+        with WebSocketCapture(args[0].driver) as capture:
+            res = func(*args, **kwargs)
+            for frame in capture.frames():
+                logger.debug("%s socket message: %s %s", frame['direction'].capitalize(), frame['timestamp'],
+                             frame['payload'])
+            for url, stats in capture.stats(update=False).items():
+                logger.info("Socket %s: %s", url, stats)
 
         return res
 
@@ -67,14 +92,14 @@ def upload_headers(func):
     @wraps(func)
     def work_with_headers(self, *args, **kwargs):
         logger.info("Remove headers 'accept' and 'Content-Type'")
-        self._headers.pop('accept')
-        self._headers.pop('Content-Type')
+        self._headers.pop('accept', None)
+        self._headers.pop('Content-Type', None)
 
         res = func(self, *args, **kwargs)
 
         logger.info("Return headers 'accept' and 'Content-Type' and delete 'X-File-Size'")
-        self._headers.pop('X-File-Size')
-        self._headers.pop('X-File-Size-From')
+        self._headers.pop('X-File-Size', None)
+        self._headers.pop('X-File-Size-From', None)
         self._headers['accept'] = 'text/plain'
         self._headers['Content-Type'] = 'application/json-patch+json'
 
@@ -0,0 +1,109 @@
+import itertools
+import logging
+import threading
+from time import perf_counter, sleep
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class GridClient:
+    """
+    Selenium Grid admission client.
+    Session requests of this process wait in a local FIFO queue until Grid /status reports a free slot,
+    so Grid isn't flooded with requests it can't serve. Node with max free slots is chosen and its
+    stereotype capabilities are returned for the new session.
+    """
+    def __init__(self, url: str, poll_interval: float = 1.0, timeout: float = 600, request_timeout: float = 10):
+        """
+        :param url: str - Grid url, same as command_executor
+        :param poll_interval: float - /status poll interval while waiting, seconds
+        :param timeout: float - max queue wait, seconds
+        :param request_timeout: float - /status request timeout, seconds
+        """
+        self._url = url.rstrip('/')
+        self._poll_interval = poll_interval
+        self._timeout = timeout
+        self._request_timeout = request_timeout
+        self._condition = threading.Condition()
+        self._tickets = itertools.count()
+        self._queue = []
+        self._pending = 0
+        self._started = 0
+        self._wait_times = []
+
+    @property
+    def url(self):
+        return self._url
+
+    def status(self):
+        response = requests.get(f'{self._url}/status', timeout=self._request_timeout)
+        response.raise_for_status()
+        return response.json()['value']
+
+    def free_nodes(self, browser_name: str = 'chrome'):
+        """Nodes with free slots for browser: list of (free_slots, stereotype), most free first"""
+        nodes = []
+        for node in self.status().get('nodes', []):
+            if node.get('availability', 'UP') != 'UP':
+                continue
+            slots = [slot for slot in node.get('slots', [])
+                     if slot.get('stereotype', {}).get('browserName', browser_name) == browser_name]
+            busy = sum(1 for slot in slots if slot.get('session'))
+            free = min(len(slots), node.get('maxSessions', len(slots))) - busy
+            if free > 0:
+                nodes.append((free, slots[0].get('stereotype', {})))
+        nodes.sort(key=lambda node: node[0], reverse=True)
+        return nodes
+
+    def acquire_slot(self, browser_name: str = 'chrome'):
+        """
+        Wait in queue for free slot. session_started() must be called after session creation attempt
+        :return: dict - stereotype capabilities of chosen node
+        """
+        ticket = next(self._tickets)
+        start = perf_counter()
+        with self._condition:
+            self._queue.append(ticket)
+        try:
+            while True:
+                with self._condition:
+                    self._condition.wait_for(lambda: self._queue[0] == ticket)
+                    started = self._started
+                try:
+                    nodes = self.free_nodes(browser_name)
+                except (requests.RequestException, KeyError, ValueError) as e:
+                    logger.warning("Grid status error: %s", e)
+                    nodes = []
+                with self._condition:
+                    # sessions started after /status request may be missing in it
+                    if sum(free for free, _ in nodes) > self._pending + self._started - started:
+                        self._pending += 1
+                        wait = perf_counter() - start
+                        self._wait_times.append(wait)
+                        logger.info("Grid slot acquired after %.2f s, node %s", wait, nodes[0][1])
+                        return nodes[0][1]
+                if perf_counter() - start > self._timeout:
+                    raise TimeoutError(f"No free Grid slot for {browser_name} in {self._timeout} s")
+                sleep(self._poll_interval)
+        finally:
+            with self._condition:
+                self._queue.remove(ticket)
+                self._condition.notify_all()
+
+    def session_started(self):
+        """Slot reservation is over: session is created (now visible in /status) or failed"""
+        with self._condition:
+            self._pending = max(self._pending - 1, 0)
+            self._started += 1
+
+    def metrics(self):
+        """Queue wait time metrics, seconds"""
+        waits = sorted(self._wait_times)
+        if not waits:
+            return {'sessions': 0, 'mean_wait': 0.0, 'p90_wait': 0.0, 'max_wait': 0.0, 'queued': len(self._queue)}
+        return {'sessions': len(waits),
+                'mean_wait': sum(waits) / len(waits),
+                'p90_wait': waits[min(int(len(waits) * 0.9), len(waits) - 1)],
+                'max_wait': waits[-1],
+                'queued': len(self._queue)}
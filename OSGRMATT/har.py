@@ -0,0 +1,195 @@
+import gzip
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from OSGRMATT.perflog import get_collector
+
+logger = logging.getLogger(__name__)
+
+
+def _headers(headers: dict):
+    return [{'name': name, 'value': str(value)} for name, value in (headers or {}).items()]
+
+
+def _span(timing: dict, start: str, end: str):
+    if timing.get(start, -1) < 0 or timing.get(end, -1) < 0:
+        return -1
+    return round(timing[end] - timing[start], 3)
+
+
+class HarWriter:
+    """
+    Streams driver network traffic to HAR 1.2 file during the test.
+    Entry is written as soon as its request is finished, only unfinished requests are kept in memory.
+    Needs goog:loggingPrefs performance log. Events are taken from the driver performance log collector,
+    its background thread is started if not running (and stopped on close), flush() writes events right away.
+    """
+    def __init__(self, driver, path, include_bodies: bool = False, max_body_size: int = 1024 * 1024,
+                 max_pending: int = 5000, compress: bool = None, stream_interval: float = 1.0):
+        """
+        :param driver: webdriver
+        :param path: str/Path - HAR file, gzipped if compress or name ends with .gz
+        :param include_bodies: bool - add response bodies (one CDP call per response)
+        :param max_body_size: int - bodies longer than this are skipped
+        :param max_pending: int - unfinished requests kept, oldest are written as is when exceeded
+        :param compress: bool - gzip output, default by file extension
+        :param stream_interval: float - seconds between performance log drains, None - only flush() and close()
+        """
+        self._driver = driver
+        self._path = Path(path)
+        self._include_bodies = include_bodies
+        self._max_body_size = max_body_size
+        self._max_pending = max_pending
+        self._pending = OrderedDict()
+        self._count = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        if compress is None:
+            compress = self._path.suffix == '.gz'
+        self._file = gzip.open(self._path, 'wt', encoding='utf-8') if compress else \
+            open(self._path, 'w', encoding='utf-8')
+        self._file.write('{"log": {"version": "1.2", "creator": {"name": "OSGRMATT", "version": "1"}, '
+                         '"pages": [], "entries": [\n')
+        self._collector = get_collector(driver)
+        self._collector.subscribe(self._on_event, 'Network.')
+        self._started_collector = stream_interval is not None and self._collector.start(stream_interval)
+
+    @property
+    def entries(self):
+        return self._count
+
+    def _on_event(self, event: dict):
+        with self._lock:
+            if not self._closed:
+                self._add_event(event)
+
+    def _add_event(self, event: dict):
+        params = event['params']
+        request_id = params.get('requestId')
+        method = event['method']
+        if method == 'Network.requestWillBeSent':
+            if 'redirectResponse' in params and request_id in self._pending:
+                entry = self._pending.pop(request_id)
+                entry['response'] = params['redirectResponse']
+                self._write(entry, params['timestamp'])
+            self._pending[request_id] = {'request': params, 'response': None, 'last_timestamp': params['timestamp']}
+            while len(self._pending) > self._max_pending:
+                _, entry = self._pending.popitem(last=False)
+                self._write(entry, None)
+        elif request_id in self._pending:
+            entry = self._pending[request_id]
+            entry['last_timestamp'] = params.get('timestamp', entry['last_timestamp'])
+            if method == 'Network.responseReceived':
+                entry['response'] = params['response']
+                entry['type'] = params.get('type')
+            elif method == 'Network.loadingFinished':
+                entry['size'] = params.get('encodedDataLength', 0)
+                self._write(self._pending.pop(request_id), params['timestamp'], request_id)
+            elif method == 'Network.loadingFailed':
+                entry['error'] = params.get('blockedReason') or params.get('errorText')
+                self._write(self._pending.pop(request_id), params['timestamp'])
+
+    def _body(self, request_id: str, size: int):
+        if size > self._max_body_size:
+            return {'comment': f'body skipped: {size} bytes'}
+        try:
+            body = self._driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+        except Exception as e:
+            return {'comment': f'body not available: {e}'}
+        if len(body['body']) > self._max_body_size:
+            return {'comment': f"body skipped: {len(body['body'])} chars"}
+        content = {'text': body['body']}
+        if body.get('base64Encoded'):
+            content['encoding'] = 'base64'
+        return content
+
+    def _write(self, entry: dict, end_timestamp: float = None, request_id: str = None):
+        request = entry['request']
+        response = entry['response'] or {}
+        timing = response.get('timing') or {}
+        timings = {'blocked': -1,
+                   'dns': _span(timing, 'dnsStart', 'dnsEnd'),
+                   'connect': _span(timing, 'connectStart', 'connectEnd'),
+                   'ssl': _span(timing, 'sslStart', 'sslEnd'),
+                   'send': max(_span(timing, 'sendStart', 'sendEnd'), 0),
+                   'wait': max(_span(timing, 'sendEnd', 'receiveHeadersEnd'), 0),
+                   'receive': 0}
+        if timing and end_timestamp:
+            headers_end = timing['requestTime'] + timing.get('receiveHeadersEnd', 0) / 1000
+            timings['receive'] = round(max(end_timestamp - headers_end, 0) * 1000, 3)
+        # unfinished request: time up to its last seen event
+        end = end_timestamp or entry.get('last_timestamp', request['timestamp'])
+        total = max(end - request['timestamp'], 0) * 1000
+        size = entry.get('size', response.get('encodedDataLength', -1))
+        content = {'size': size, 'mimeType': response.get('mimeType', '')}
+        if self._include_bodies and request_id and response:
+            content.update(self._body(request_id, size))
+        started = datetime.fromtimestamp(request.get('wallTime', 0), tz=timezone.utc)
+        har_entry = {'startedDateTime': started.isoformat(),
+                     'time': round(total, 3),
+                     'request': {'method': request['request']['method'],
+                                 'url': request['request']['url'],
+                                 'httpVersion': response.get('protocol', ''),
+                                 'headers': _headers(request['request'].get('headers')),
+                                 'queryString': [],
+                                 'cookies': [],
+                                 'headersSize': -1,
+                                 'bodySize': len(request['request'].get('postData', ''))},
+                     'response': {'status': response.get('status', 0),
+                                  'statusText': response.get('statusText', entry.get('error', '')),
+                                  'httpVersion': response.get('protocol', ''),
+                                  'headers': _headers(response.get('headers')),
+                                  'cookies': [],
+                                  'content': content,
+                                  'redirectURL': (response.get('headers') or {}).get('location', ''),
+                                  'headersSize': -1,
+                                  'bodySize': size},
+                     'cache': {},
+                     'timings': timings,
+                     '_resourceType': entry.get('type') or request.get('type'),
+                     '_fromCache': bool(response.get('fromDiskCache') or response.get('fromServiceWorker'))}
+        if not end_timestamp:
+            har_entry['comment'] = 'request not finished'
+        if self._count:
+            self._file.write(',\n')
+        self._file.write(json.dumps(har_entry))
+        self._count += 1
+
+    def flush(self):
+        """Take new events from performance log and write finished requests"""
+        self._collector.drain()
+        with self._lock:
+            if not self._closed:
+                self._file.flush()
+
+    def close(self):
+        """Write the rest and finish HAR file. Repeated calls do nothing"""
+        if self._closed:
+            return
+        if self._started_collector:
+            self._collector.stop()
+        try:
+            self._collector.drain()
+        except Exception as e:
+            logger.warning("HAR: performance log drain error: %s", e)
+        self._collector.unsubscribe(self._on_event)
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            while self._pending:
+                _, entry = self._pending.popitem(last=False)
+                self._write(entry, None)
+            self._file.write('\n]}}\n')
+            self._file.close()
+        logger.info("HAR %s saved: %s entries", self._path, self._count)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,98 @@
+import itertools
+import logging
+from time import sleep
+
+logger = logging.getLogger(__name__)
+
+# CDP modifiers bit field
+ALT = 1
+CTRL = 2
+META = 4
+SHIFT = 8
+
+# key: (code, windowsVirtualKeyCode, text)
+_KEYS = {'Escape': ('Escape', 27, None),
+         'Enter': ('Enter', 13, '\r'),
+         'Tab': ('Tab', 9, None),
+         'Backspace': ('Backspace', 8, None),
+         'Delete': ('Delete', 46, None),
+         'F5': ('F5', 116, None),
+         ' ': ('Space', 32, ' ')}
+
+
+def _key_definition(key: str):
+    if key in _KEYS:
+        return _KEYS[key]
+    if len(key) == 1 and key.isascii() and key.isalpha():
+        return f'Key{key.upper()}', ord(key.upper()), key
+    if len(key) == 1 and key.isdigit():
+        return f'Digit{key}', ord(key), key
+    return '', 0, key
+
+
+class CDPKeyboard:
+    """
+    Keyboard input through CDP Input domain, for Chromium drivers only (see available).
+    insert_text types whole string in one call; type_text sends real key events for every char with
+    optional deterministic delay profile.
+    """
+    def __init__(self, driver, delay_profile=None):
+        """
+        :param driver: webdriver
+        :param delay_profile: default delay between keystrokes: seconds, list of seconds (cycled)
+                              or callable(index, char) -> seconds
+        """
+        self._driver = driver
+        self._delay_profile = delay_profile
+        self._available = None
+
+    @property
+    def available(self):
+        """Driver supports CDP commands (local Chromium drivers)"""
+        if self._available is None:
+            browser = (getattr(self._driver, 'capabilities', None) or {}).get('browserName', '').lower()
+            self._available = hasattr(self._driver, 'execute_cdp_cmd') and browser in (
+                'chrome', 'chromium', 'msedge', 'microsoftedge', 'headless chrome')
+        return self._available
+
+    def delays(self, text: str, delay_profile=None):
+        """Delays before every char of text by profile"""
+        profile = self._delay_profile if delay_profile is None else delay_profile
+        if not profile:
+            return [0] * len(text)
+        if callable(profile):
+            return [profile(i, char) for i, char in enumerate(text)]
+        if isinstance(profile, (int, float)):
+            return [profile] * len(text)
+        return list(itertools.islice(itertools.cycle(profile), len(text)))
+
+    def _dispatch(self, event_type: str, key: str, modifiers: int = 0, text: str = None):
+        code, key_code, key_text = _key_definition(key)
+        params = {'type': event_type, 'key': key, 'code': code, 'modifiers': modifiers,
+                  'windowsVirtualKeyCode': key_code}
+        text = key_text if text is None else text
+        if event_type == 'keyDown' and text and not modifiers & (CTRL | ALT | META):
+            params['text'] = text
+        self._driver.execute_cdp_cmd('Input.dispatchKeyEvent', params)
+
+    def insert_text(self, text: str):
+        """Insert text into focused element in one call, without key events"""
+        self._driver.execute_cdp_cmd('Input.insertText', {'text': text})
+
+    def type_text(self, text: str, delay_profile=None):
+        """Send keyDown/keyUp for every char of text to focused element"""
+        for char, delay in zip(text, self.delays(text, delay_profile)):
+            if delay:
+                sleep(delay)
+            self._dispatch('keyDown', char)
+            self._dispatch('keyUp', char)
+
+    def press(self, key: str, modifiers: int = 0):
+        """Press key, e.g. press('Escape'), press('a', CTRL)"""
+        self._dispatch('keyDown', key, modifiers)
+        self._dispatch('keyUp', key, modifiers)
+
+    def hard_reload(self):
+        """Reload page ignoring cache (Ctrl+F5)"""
+        self._driver.execute_cdp_cmd('Page.reload', {'ignoreCache': True})
+
@@ -0,0 +1,168 @@
+import json
+import logging
+import math
+import threading
+from pathlib import Path
+from time import perf_counter, sleep
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """Compact log-bucket latency histogram, relative error about 1%"""
+    _BUCKETS_PER_E = 100
+
+    def __init__(self):
+        self._counts = {}
+        self.count = 0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        micros = max(seconds * 1_000_000, 1.0)
+        bucket = int(math.log(micros) * self._BUCKETS_PER_E)
+        self._counts[bucket] = self._counts.get(bucket, 0) + 1
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: 'LatencyHistogram'):
+        for bucket, count in other._counts.items():
+            self._counts[bucket] = self._counts.get(bucket, 0) + count
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent: float):
+        """Latency in seconds for percent in 0..100"""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bucket in sorted(self._counts):
+            seen += self._counts[bucket]
+            if seen >= rank:
+                return min(math.exp((bucket + 1) / self._BUCKETS_PER_E) / 1_000_000, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {'count': self.count,
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99),
+                'max': self.max}
+
+
+class LoadResult:
+    def __init__(self, name: str, duration: float, histogram: LatencyHistogram, errors: int):
+        self.name = name
+        self.duration = duration
+        self.histogram = histogram
+        self.errors = errors
+
+    @property
+    def requests(self):
+        return self.histogram.count
+
+    @property
+    def error_rate(self):
+        return self.errors / self.requests if self.requests else 0.0
+
+    @property
+    def rps(self):
+        return self.requests / self.duration if self.duration else 0.0
+
+    def to_dict(self):
+        return {'name': self.name,
+                'duration': self.duration,
+                'requests': self.requests,
+                'errors': self.errors,
+                'error_rate': self.error_rate,
+                'rps': self.rps,
+                'latency': self.histogram.to_dict()}
+
+    def to_json(self, path):
+        """Save result to json file"""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def assert_budget(self, p50: float = None, p90: float = None, p99: float = None, max_latency: float = None,
+                      error_rate: float = None):
+        """Assert latencies (seconds) and error rate are within budget"""
+        latency = self.histogram.to_dict()
+        failed = []
+        for key, budget in (('p50', p50), ('p90', p90), ('p99', p99), ('max', max_latency)):
+            if budget is not None and latency[key] > budget:
+                failed.append(f'{key} {latency[key]:.3f}s > {budget}s')
+        if error_rate is not None and self.error_rate > error_rate:
+            failed.append(f'error rate {self.error_rate:.2%} > {error_rate:.2%}')
+        assert not failed, f"Load {self.name} budget exceeded: {', '.join(failed)}"
+
+
+class LoadRunner:
+    """
+    Calls target repeatedly from concurrency threads for duration seconds, optionally limited to rps.
+    Target is any callable, e.g. lambda: users_endpoint.get_users(). For APIBase targets call
+    enable_concurrent_mode() and keep pool size >= concurrency.
+    Exception in target, or is_error(result) == True, counts as error.
+    """
+    def __init__(self, target, duration: float = 10.0, concurrency: int = 1, rps: float = None,
+                 is_error=None, name: str = None):
+        self._target = target
+        self._duration = duration
+        self._concurrency = concurrency
+        self._rps = rps
+        self._is_error = is_error
+        self._name = name or getattr(target, '__name__', 'load')
+        self._lock = threading.Lock()
+        self._sent = 0
+
+    def _next_slot(self, start: float):
+        """Start time for next request in rps mode"""
+        with self._lock:
+            slot = start + self._sent / self._rps
+            self._sent += 1
+        return slot
+
+    def _worker(self, start: float, deadline: float, histogram: LatencyHistogram, errors: list):
+        while True:
+            if self._rps:
+                slot = self._next_slot(start)
+                if slot >= deadline:
+                    return
+                delay = slot - perf_counter()
+                if delay > 0:
+                    sleep(delay)
+            elif perf_counter() >= deadline:
+                return
+            began = perf_counter()
+            try:
+                result = self._target()
+                failed = bool(self._is_error and self._is_error(result))
+            except Exception as e:
+                logger.debug("Load %s request error: %s", self._name, e)
+                failed = True
+            histogram.record(perf_counter() - began)
+            if failed:
+                errors[0] += 1
+
+    def run(self):
+        logger.info("Start load %s: %s threads, rps %s, %s s", self._name, self._concurrency, self._rps,
+                    self._duration)
+        self._sent = 0
+        histograms = [LatencyHistogram() for _ in range(self._concurrency)]
+        errors = [[0] for _ in range(self._concurrency)]
+        start = perf_counter()
+        deadline = start + self._duration
+        threads = [threading.Thread(target=self._worker, args=(start, deadline, histograms[i], errors[i]),
+                                    name=f'load_{i}', daemon=True)
+                   for i in range(self._concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        histogram = LatencyHistogram()
+        for worker_histogram in histograms:
+            histogram.merge(worker_histogram)
+        result = LoadResult(self._name, perf_counter() - start, histogram, sum(e[0] for e in errors))
+        logger.info("Load %s result: %s", self._name, result.to_dict())
+        return result
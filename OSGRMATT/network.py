@@ -0,0 +1,252 @@
+import itertools
+import logging
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from OSGRMATT.perflog import get_collector
+
+logger = logging.getLogger(__name__)
+
+_ANALYTICS = ['*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*mc.yandex.ru*',
+              '*top-fwz1.mail.ru*', '*connect.facebook.net*', '*hotjar.com*', '*sentry.io*']
+
+# CDP Network.setBlockedURLs works with url patterns only, resource types are blocked by extensions
+# at the end of url path (with or without query), so hosts and paths like /icons.json aren't matched
+_RESOURCE_TYPE_EXTENSIONS = {'Image': ['png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'ico'],
+                             'Font': ['woff', 'woff2', 'ttf', 'otf', 'eot'],
+                             'Media': ['mp4', 'webm', 'mp3', 'ogg', 'wav'],
+                             'Stylesheet': ['css']}
+RESOURCE_TYPE_PATTERNS = {resource_type: [pattern for extension in extensions
+                                          for pattern in (f'*.{extension}', f'*.{extension}?*')]
+                          for resource_type, extensions in _RESOURCE_TYPE_EXTENSIONS.items()}
+
+# throttle: latency ms, download/upload bytes per second
+NETWORK_PROFILES = {'no_analytics': {'blocked_urls': _ANALYTICS},
+                    'lean': {'blocked_urls': _ANALYTICS, 'blocked_types': ['Image', 'Font', 'Media']},
+                    'slow_3g': {'throttle': {'latency': 400, 'download': 50_000, 'upload': 50_000}},
+                    'fast_3g': {'throttle': {'latency': 150, 'download': 200_000, 'upload': 90_000}},
+                    'slow_4g': {'throttle': {'latency': 80, 'download': 500_000, 'upload': 250_000}},
+                    'offline': {'throttle': {'offline': True, 'latency': 0, 'download': -1, 'upload': -1}}}
+
+
+def get_network_profile(profile):
+    """Profile dict by name (or names joined by '+', e.g. 'lean+slow_3g') or dict itself"""
+    if profile is None or isinstance(profile, dict):
+        return profile
+    merged = {'blocked_urls': [], 'blocked_types': []}
+    for name in profile.split('+'):
+        try:
+            named = NETWORK_PROFILES[name]
+        except KeyError:
+            raise ValueError(f"Unknown network profile: {name}. Available: {', '.join(NETWORK_PROFILES)}")
+        merged['blocked_urls'] += named.get('blocked_urls', [])
+        merged['blocked_types'] += named.get('blocked_types', [])
+        if 'throttle' in named:
+            merged['throttle'] = named['throttle']
+    return merged
+
+
+_profiled_drivers = weakref.WeakKeyDictionary()
+
+
+def profiled_drivers():
+    """Alive drivers with applied network profile"""
+    return list(_profiled_drivers.keys())
+
+
+def apply_network_profile(driver, profile):
+    """Apply network profile to driver through CDP. Works with Chromium drivers supporting execute_cdp_cmd"""
+    profile = get_network_profile(profile)
+    if not profile:
+        return
+    if not hasattr(driver, 'execute_cdp_cmd'):
+        logger.warning("Network profile isn't applied: driver doesn't support CDP commands")
+        return
+    urls = list(profile.get('blocked_urls', []))
+    for resource_type in profile.get('blocked_types', []):
+        urls += RESOURCE_TYPE_PATTERNS.get(resource_type, [])
+    driver.execute_cdp_cmd('Network.enable', {})
+    if urls:
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': urls})
+    throttle = profile.get('throttle')
+    if throttle:
+        driver.execute_cdp_cmd('Network.emulateNetworkConditions',
+                               {'offline': throttle.get('offline', False),
+                                'latency': throttle.get('latency', 0),
+                                'downloadThroughput': throttle.get('download', -1),
+                                'uploadThroughput': throttle.get('upload', -1)})
+    _profiled_drivers[driver] = profile
+    logger.info("Network profile applied: %s blocked patterns, throttle %s", len(urls), throttle)
+
+
+def log_network_profile_stats(driver):
+    """
+    Log blocked requests (by resource type) and loaded bytes since last call.
+    Needs goog:loggingPrefs performance log.
+    """
+    blocked = {}
+    loaded_bytes = 0
+    for message in get_collector(driver).read('network_profile_stats', 'Network.'):
+        params = message['params']
+        if message['method'] == 'Network.loadingFailed' and params.get('blockedReason'):
+            resource_type = params.get('type', 'Other')
+            blocked[resource_type] = blocked.get(resource_type, 0) + 1
+        elif message['method'] == 'Network.loadingFinished':
+            loaded_bytes += params.get('encodedDataLength', 0)
+    stats = {'blocked': sum(blocked.values()), 'blocked_by_type': blocked, 'loaded_bytes': int(loaded_bytes)}
+    logger.info("Network profile stats: %s", stats)
+    return stats
+
+
+class NetworkEventIndex:
+    """
+    Index of Network.* performance log events by requestId, url and resource type.
+    Updated incrementally from the driver performance log collector, keeps last max_requests requests.
+    Records get seq when request is first seen and response_seq when its response is received
+    (one counter, last_seq), so callers can take records which got response since their last look.
+    """
+    def __init__(self, driver, max_requests: int = 10000):
+        self._driver = weakref.ref(driver)
+        self._collector = get_collector(driver)
+        self._consumer = f'network_index_{id(self)}'
+        self._max_requests = max_requests
+        self._requests = OrderedDict()
+        self._by_url = {}
+        self._by_type = {}
+        self._seq = itertools.count()
+        self.last_seq = -1
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._requests)
+
+    def update(self):
+        """Index new events, return count"""
+        events = self._collector.read(self._consumer, 'Network.')
+        with self._lock:
+            for event in events:
+                self._add(event)
+        return len(events)
+
+    def _link(self, index: dict, key, request_id: str):
+        if key:
+            index.setdefault(key, {})[request_id] = None
+
+    def _unlink(self, index: dict, key, request_id: str):
+        ids = index.get(key)
+        if ids is not None:
+            ids.pop(request_id, None)
+            if not ids:
+                del index[key]
+
+    def _add(self, event: dict):
+        params = event['params']
+        request_id = params.get('requestId')
+        if not request_id:
+            return
+        record = self._requests.get(request_id)
+        if record is None:
+            self.last_seq = next(self._seq)
+            record = self._requests[request_id] = {'seq': self.last_seq, 'requestId': request_id,
+                                                   'url': None, 'type': None, 'response_seq': None,
+                                                   'method': None, 'status': None, 'mimeType': None,
+                                                   'finished': False, 'failed': None, 'encodedDataLength': 0,
+                                                   'timestamp': params.get('timestamp')}
+            while len(self._requests) > self._max_requests:
+                old_id, old = self._requests.popitem(last=False)
+                self._unlink(self._by_url, old['url'], old_id)
+                self._unlink(self._by_type, old['type'], old_id)
+        method = event['method']
+        url = resource_type = None
+        if method == 'Network.requestWillBeSent':
+            url = params['request']['url']
+            resource_type = params.get('type')
+            record['method'] = params['request']['method']
+        elif method == 'Network.responseReceived':
+            url = params['response']['url']
+            resource_type = params.get('type')
+            record['status'] = params['response']['status']
+            record['mimeType'] = params['response'].get('mimeType')
+            record['response_seq'] = self.last_seq = next(self._seq)
+        elif method == 'Network.loadingFinished':
+            record['finished'] = True
+            record['encodedDataLength'] = params.get('encodedDataLength', 0)
+        elif method == 'Network.loadingFailed':
+            record['failed'] = params.get('blockedReason') or params.get('errorText')
+            resource_type = params.get('type')
+        if url and url != record['url']:
+            self._unlink(self._by_url, record['url'], request_id)
+            record['url'] = url
+            self._link(self._by_url, url, request_id)
+        if resource_type and resource_type != record['type']:
+            self._unlink(self._by_type, record['type'], request_id)
+            record['type'] = resource_type
+            self._link(self._by_type, resource_type, request_id)
+
+    def get(self, request_id: str):
+        return self._requests.get(request_id)
+
+    def find(self, url: str = None, prefix: str = None, regex: str = None, resource_type: str = None,
+             update: bool = True):
+        """
+        Requests matching all given filters, oldest first
+        :param url: str - exact url
+        :param prefix: str - url prefix
+        :param regex: str - url regex (search)
+        :param resource_type: str - XHR, Fetch, Document, Image...
+        :param update: bool - index new events first
+        """
+        if update:
+            self.update()
+        with self._lock:
+            if url is not None:
+                ids = set(self._by_url.get(url, ()))
+            elif prefix is not None or regex is not None:
+                pattern = re.compile(regex) if regex is not None else None
+                ids = set()
+                for key, key_ids in self._by_url.items():
+                    if (prefix is None or key.startswith(prefix)) and (pattern is None or pattern.search(key)):
+                        ids.update(key_ids)
+            else:
+                ids = None
+            if resource_type is not None:
+                type_ids = self._by_type.get(resource_type, {})
+                ids = set(type_ids) if ids is None else ids.intersection(type_ids)
+            if ids is None:
+                return list(self._requests.values())
+            return sorted((self._requests[request_id] for request_id in ids), key=lambda record: record['seq'])
+
+    def fetch_bodies(self, records: list, workers: int = 8):
+        """
+        Network.getResponseBody for many requests with parallel CDP calls
+        :return: dict requestId -> body (None if body isn't available)
+        """
+        driver = self._driver()
+
+        def fetch(request_id):
+            try:
+                return request_id, driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})['body']
+            except Exception as e:
+                logger.warning("Response body of %s isn't available: %s", request_id, e)
+                return request_id, None
+
+        request_ids = [record['requestId'] for record in records]
+        if len(request_ids) <= 1:
+            return dict(fetch(request_id) for request_id in request_ids)
+        with ThreadPoolExecutor(max_workers=min(workers, len(request_ids))) as executor:
+            return dict(executor.map(fetch, request_ids))
+
+
+_indexes = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_network_index(driver):
+    """Network event index of driver, one per driver"""
+    with _indexes_lock:
+        index = _indexes.get(driver)
+        if index is None:
+            index = _indexes[driver] = NetworkEventIndex(driver)
+        return index
@@ -0,0 +1,114 @@
+import itertools
+import json
+import logging
+import threading
+import weakref
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class PerformanceLogCollector:
+    """
+    Single reader of driver performance log.
+    driver.get_log('performance') drains the log, so all consumers must read events through the collector:
+    every entry is parsed once, kept in a ring buffer and fanned out to subscribers; read(consumer) returns
+    events which this consumer hasn't seen yet. Log is drained on demand or by background thread (start()).
+    """
+    def __init__(self, driver, capacity: int = 50000):
+        """
+        :param driver: webdriver with goog:loggingPrefs performance log
+        :param capacity: int - events kept in ring buffer
+        """
+        self._driver = weakref.ref(driver)
+        self._buffer = deque(maxlen=capacity)
+        self._last_seq = 0
+        self._cursors = {}
+        self._subscribers = []
+        self._lock = threading.RLock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def drain(self):
+        """Read new entries from driver, return count"""
+        driver = self._driver()
+        if driver is None:
+            return 0
+        with self._lock:
+            entries = driver.get_log('performance')
+            for entry in entries:
+                message = json.loads(entry['message'])['message']
+                self._last_seq += 1
+                self._buffer.append((self._last_seq, message))
+                for prefix, callback in self._subscribers:
+                    if message['method'].startswith(prefix):
+                        try:
+                            callback(message)
+                        except Exception as e:
+                            logger.error("Performance log subscriber %s error: %s", callback, e)
+        return len(entries)
+
+    def subscribe(self, callback, prefix: str = ''):
+        """Call callback(event) for every new event with method starting with prefix"""
+        with self._lock:
+            self._subscribers.append((prefix, callback))
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [item for item in self._subscribers if item[1] is not callback]
+
+    def read(self, consumer: str, prefix: str = '', drain: bool = True):
+        """
+        Events not yet read by consumer
+        :param consumer: str - consumer name, every consumer has own cursor
+        :param prefix: str - filter by method prefix, e.g. 'Network.'
+        :param drain: bool - drain driver log before read
+        """
+        with self._lock:
+            if drain:
+                self.drain()
+            cursor = self._cursors.get(consumer, 0)
+            self._cursors[consumer] = self._last_seq
+            if not self._buffer:
+                return []
+            first = self._buffer[0][0]
+            if cursor and first > cursor + 1:
+                logger.warning("Consumer %s lost %s events: ring buffer overflow", consumer, first - cursor - 1)
+            return [message for _, message in itertools.islice(self._buffer, max(cursor - first + 1, 0), None)
+                    if message['method'].startswith(prefix)]
+
+    def start(self, interval: float = 1.0):
+        """Drain log in background thread every interval seconds. False if thread is already running"""
+        if self._thread is not None:
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name='performance_log', daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.drain()
+            except Exception as e:
+                logger.warning("Performance log drain stopped: %s", e)
+                return
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+
+_collectors = weakref.WeakKeyDictionary()
+_collectors_lock = threading.Lock()
+
+
+def get_collector(driver):
+    """Performance log collector of driver, one per driver"""
+    with _collectors_lock:
+        collector = _collectors.get(driver)
+        if collector is None:
+            collector = _collectors[driver] = PerformanceLogCollector(driver)
+        return collector
@@ -0,0 +1,302 @@
+import html
+import logging
+import threading
+import weakref
+from time import time, perf_counter
+import numpy as np
+from selenium.common.exceptions import WebDriverException
+
+logger = logging.getLogger(__name__)
+
+# Installed on every new document: collects LCP, CLS and long tasks from the page start
+_JS_OBSERVERS = """
+(function () {
+    var perf = window.__osgrmattPerf = {lcp: 0, cls: 0, longTasks: 0, longTaskTime: 0};
+    var observe = function (type, callback) {
+        try {
+            new PerformanceObserver(function (list) { list.getEntries().forEach(callback); })
+                .observe({type: type, buffered: true});
+        } catch (e) {}
+    };
+    observe('largest-contentful-paint', function (entry) { perf.lcp = Math.max(perf.lcp, entry.startTime); });
+    observe('layout-shift', function (entry) { if (!entry.hadRecentInput) { perf.cls += entry.value; } });
+    observe('longtask', function (entry) { perf.longTasks += 1; perf.longTaskTime += entry.duration; });
+})();
+"""
+
+_JS_COLLECT = """
+var done = arguments[arguments.length - 1];
+if (!window.__osgrmattPerf) {
+""" + _JS_OBSERVERS + """
+}
+setTimeout(function () {
+    var perf = window.__osgrmattPerf;
+    var result = {lcp: perf.lcp, cls: perf.cls, long_tasks: perf.longTasks, long_task_ms: perf.longTaskTime};
+    var nav = performance.getEntriesByType('navigation')[0];
+    if (nav) {
+        result.ttfb = nav.responseStart;
+        result.dom_content_loaded = nav.domContentLoadedEventEnd;
+        result.load = nav.loadEventEnd;
+        result.document_bytes = nav.transferSize;
+    }
+    var resources = performance.getEntriesByType('resource');
+    result.resources = resources.length;
+    result.resource_bytes = resources.reduce(function (sum, entry) { return sum + (entry.transferSize || 0); }, 0);
+    if (performance.memory) { result.js_heap_mb = performance.memory.usedJSHeapSize / 1048576; }
+    done(result);
+}, 50);
+"""
+
+_CDP_METRICS = {'JSHeapUsedSize': 'cdp_js_heap_mb', 'Nodes': 'dom_nodes', 'LayoutCount': 'layouts',
+                'RecalcStyleCount': 'style_recalcs', 'ScriptDuration': 'script_s', 'TaskDuration': 'task_s'}
+
+
+class PageMetricsRegistry:
+    """
+    Page performance collectors, read by conftest for the report of every test.
+    Collectors stay registered while alive (e.g. SeleniumLogic of session driver), every pop() returns
+    only steps sampled since the previous pop.
+    """
+    def __init__(self):
+        self._offsets = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def register(self, collector):
+        with self._lock:
+            self._offsets[collector] = len(collector.steps)
+
+    def pop(self):
+        """Copies of series sampled since last pop"""
+        records = []
+        with self._lock:
+            for collector, offset in list(self._offsets.items()):
+                size = len(collector.steps)
+                if size > offset:
+                    records.append(collector.to_dict(offset, size))
+                    self._offsets[collector] = size
+        return records
+
+
+page_metrics = PageMetricsRegistry()
+
+
+class PagePerformance:
+    """
+    Page performance metrics of driver after navigations and marked steps:
+    Navigation/Resource Timing, LCP, CLS, long tasks, JS heap and CDP Performance.getMetrics (Chromium).
+    Stored as compact time series: steps, times and one aligned values list per metric.
+    Budgets {metric: max value}, e.g. {'lcp': 2500, 'js_heap_mb': 200}, fail the test by AssertionError.
+    """
+    def __init__(self, driver, budgets: dict = None, fail_fast: bool = True):
+        """
+        :param driver: webdriver
+        :param budgets: dict - metric name: max allowed value (ms for timings, mb for heap)
+        :param fail_fast: bool - check budgets on every sample, else only in check_budgets()
+        """
+        self._driver = driver
+        self.budgets = budgets or {}
+        self._fail_fast = fail_fast
+        self._cdp = hasattr(driver, 'execute_cdp_cmd')
+        self.steps = []
+        self.times = []
+        self.series = {}
+        if self._cdp:
+            try:
+                driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': _JS_OBSERVERS})
+                driver.execute_cdp_cmd('Performance.enable', {})
+            except WebDriverException as e:
+                logger.warning("CDP performance metrics aren't available: %s", e)
+                self._cdp = False
+        page_metrics.register(self)
+
+    def sample(self, step: str):
+        """Collect metrics for step (page, action name)"""
+        metrics = self._driver.execute_async_script(_JS_COLLECT) or {}
+        if self._cdp:
+            response = self._driver.execute_cdp_cmd('Performance.getMetrics', {})
+            for metric in response.get('metrics', []):
+                name = _CDP_METRICS.get(metric['name'])
+                if name:
+                    metrics[name] = metric['value'] / 1048576 if name == 'cdp_js_heap_mb' else metric['value']
+        index = len(self.steps)
+        self.steps.append(step)
+        self.times.append(round(time(), 3))
+        for name, value in metrics.items():
+            self.series.setdefault(name, [None] * index).append(value)
+        for values in self.series.values():
+            if len(values) < index + 1:
+                values.append(None)
+        logger.info("Page performance %s: %s", step, metrics)
+        if self._fail_fast:
+            self.check_budgets()
+        return metrics
+
+    def violations(self):
+        """List of budget violations"""
+        failed = []
+        for name, budget in self.budgets.items():
+            for step, value in zip(self.steps, self.series.get(name, [])):
+                if value is not None and value > budget:
+                    failed.append(f'{step}: {name} {value:.2f} > {budget}')
+        return failed
+
+    def check_budgets(self):
+        failed = self.violations()
+        assert not failed, f"Performance budget exceeded: {'; '.join(failed)}"
+
+    def to_dict(self, start: int = 0, end: int = None):
+        """Copy of steps start:end"""
+        return {'steps': self.steps[start:end], 'times': self.times[start:end],
+                'series': {name: values[start:end] for name, values in self.series.items()},
+                'budgets': dict(self.budgets)}
+
+
+def performance_to_html(records: list):
+    """Table of page metrics for pytest-html extras"""
+    tables = []
+    for record in records:
+        names = sorted(record['series'])
+        head = '<tr><th>Step</th>' + ''.join(f'<th>{html.escape(name)}</th>' for name in names) + '</tr>'
+        rows = ''
+        for i, step in enumerate(record['steps']):
+            cells = ''.join('<td></td>' if record['series'][name][i] is None
+                            else f"<td>{record['series'][name][i]:.2f}</td>" for name in names)
+            rows += f'<tr><td>{html.escape(str(step))}</td>{cells}</tr>'
+        tables.append(f'<table>{head}{rows}</table>')
+    return '<p>Page performance</p>' + ''.join(tables)
+
+
+class HeapSampler:
+    """
+    Background sampler of JS heap (MB) and DOM nodes count into numpy ring buffer.
+    One driver call per sample: CDP Performance.getMetrics on Chromium, execute_script otherwise.
+    Heap growth trend is a linear regression slope (MB per minute) over the samples.
+    First and last samples are taken after forced GC (CDP HeapProfiler.collectGarbage), and heap counts as
+    leaking only when the trend, the sampled time span and the growth between them are all large enough,
+    so GC noise of short runs is not a leak.
+    """
+    _MIN_SAMPLES = 5
+
+    def __init__(self, driver, interval: float = 1.0, capacity: int = 3600, leak_threshold: float = 1.0,
+                 min_span: float = 30, min_growth: float = 1.0):
+        """
+        :param driver: webdriver
+        :param interval: float - seconds between samples
+        :param capacity: int - samples kept
+        :param leak_threshold: float - heap growth MB per minute treated as leak
+        :param min_span: float - seconds of sampling needed to judge the trend
+        :param min_growth: float - MB the heap must grow between first and last sample
+        """
+        self._driver = driver
+        self._interval = interval
+        self._leak_threshold = leak_threshold
+        self._min_span = min_span
+        self._min_growth = min_growth
+        self._buffer = np.full((capacity, 3), np.nan)
+        self._count = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._cdp = hasattr(driver, 'execute_cdp_cmd')
+        if self._cdp:
+            try:
+                driver.execute_cdp_cmd('Performance.enable', {})
+            except WebDriverException:
+                self._cdp = False
+
+    def _read(self):
+        if self._cdp:
+            metrics = {metric['name']: metric['value']
+                       for metric in self._driver.execute_cdp_cmd('Performance.getMetrics', {})['metrics']}
+            return metrics['JSHeapUsedSize'] / 1048576, metrics['Nodes']
+        return self._driver.execute_script("return [window.performance.memory.usedJSHeapSize / 1048576, "
+                                           "document.getElementsByTagName('*').length];")
+
+    def collect_garbage(self):
+        """Force GC in page (CDP only)"""
+        if self._cdp:
+            try:
+                self._driver.execute_cdp_cmd('HeapProfiler.collectGarbage', {})
+            except WebDriverException as e:
+                logger.debug("HeapProfiler.collectGarbage failed: %s", e)
+
+    def sample(self):
+        """Take one sample"""
+        heap, nodes = self._read()
+        with self._lock:
+            self._buffer[self._count % len(self._buffer)] = (perf_counter(), heap, nodes)
+            self._count += 1
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self.sample()
+            except WebDriverException as e:
+                logger.warning("Heap sampling stopped: %s", e)
+                return
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self.collect_garbage()
+        self.sample()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='heap_sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        try:
+            self.collect_garbage()
+            self.sample()
+        except WebDriverException:
+            pass
+
+    def samples(self):
+        """Samples array [time, heap_mb, nodes] in time order"""
+        with self._lock:
+            size = len(self._buffer)
+            if self._count <= size:
+                return self._buffer[:self._count].copy()
+            start = self._count % size
+            return np.concatenate((self._buffer[start:], self._buffer[:start]))
+
+    def stats(self):
+        """peak, mean, growth and growth slope per minute of heap and nodes, sampled time span"""
+        samples = self.samples()
+        if not len(samples):
+            return {'samples': 0}
+        minutes = (samples[:, 0] - samples[0, 0]) / 60
+        stats = {'samples': len(samples), 'span_s': float(minutes[-1] * 60)}
+        for column, name in ((1, 'heap_mb'), (2, 'nodes')):
+            values = samples[:, column]
+            stats[f'{name}_peak'] = float(values.max())
+            stats[f'{name}_mean'] = float(values.mean())
+            stats[f'{name}_growth'] = float(values[-1] - values[0])
+            stats[f'{name}_slope'] = float(np.polyfit(minutes, values, 1)[0]) if minutes[-1] > 0 else 0.0
+        return stats
+
+    def is_leaking(self, stats: dict = None):
+        stats = stats or self.stats()
+        return (stats['samples'] >= self._MIN_SAMPLES and stats['span_s'] >= self._min_span
+                and stats['heap_mb_slope'] > self._leak_threshold and stats['heap_mb_growth'] > self._min_growth)
+
+    def check(self):
+        """Fail if heap growth trend exceeds leak threshold"""
+        stats = self.stats()
+        logger.info("Heap stats: %s", stats)
+        if stats['samples'] and stats['span_s'] < self._min_span:
+            logger.info("Heap sampled %.1f s < %s s, too short for leak check", stats['span_s'], self._min_span)
+        assert not self.is_leaking(stats), \
+            f"JS heap grows {stats['heap_mb_slope']:.2f} MB/min > {self._leak_threshold} MB/min " \
+            f"({stats['heap_mb_growth']:.2f} MB in {stats['span_s']:.0f} s): {stats}"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
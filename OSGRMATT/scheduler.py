@@ -0,0 +1,130 @@
+import logging
+import threading
+from collections import deque
+from time import perf_counter
+from selenium.common.exceptions import InvalidSessionIdException, WebDriverException
+from OSGRMATT.browser import Browser, DriverPool, SeleniumLogic
+
+logger = logging.getLogger(__name__)
+
+
+class ScenarioScheduler:
+    """
+    Runs independent browser scenarios in parallel, one driver per worker.
+    Scenario is a callable taking SeleniumLogic, or (callable, worker_index) tuple to pin it to a worker.
+    Every worker keeps its driver between scenarios (reset as in DriverPool), takes scenarios from its own
+    queue and steals unpinned ones from the longest queue of other workers when its queue is empty.
+    Scenario which lost the driver session is rerun on a new driver up to retries times.
+    Scenarios which never finished (e.g. pinned to a crashed worker) get 'not_run' status.
+    """
+    def __init__(self, workers: list = None, driver_factory=None, retries: int = 1, max_reuse: int = 50):
+        """
+        :param workers: list of command_executor per worker, None - local Chrome, url - Grid. Default [None]
+        :param driver_factory: callable(command_executor) returning driver, default Browser().setup_driver
+        :param retries: int - reruns of scenario after session loss
+        :param max_reuse: int - scenarios per driver before it's recycled
+        """
+        self._workers = workers or [None]
+        self._driver_factory = driver_factory or (lambda executor: Browser().setup_driver(command_executor=executor))
+        self._retries = retries
+        self._max_reuse = max_reuse
+        self._queues = []
+        self._worker_errors = {}
+        self._lock = threading.Lock()
+
+    def _session_lost(self, pool: DriverPool, driver, error: Exception):
+        return isinstance(error, InvalidSessionIdException) or (
+            isinstance(error, WebDriverException) and not pool.is_healthy(driver))
+
+    def _next(self, index: int):
+        """Own task or task stolen from the longest other queue"""
+        with self._lock:
+            if self._queues[index]:
+                return self._queues[index].popleft()
+            victims = sorted((queue for i, queue in enumerate(self._queues) if i != index), key=len, reverse=True)
+            for queue in victims:
+                for task in reversed(queue):
+                    if task['worker'] is None:
+                        queue.remove(task)
+                        logger.info("Worker %s stole scenario %s", index, task['name'])
+                        return task
+        return None
+
+    def _worker(self, index: int, results: list):
+        executor = self._workers[index]
+        pool = DriverPool(lambda: self._driver_factory(executor), max_size=1, max_reuse=self._max_reuse)
+        try:
+            while True:
+                task = self._next(index)
+                if task is None:
+                    return
+                task['attempts'] += 1
+                task['runner'] = index
+                start = perf_counter()
+                result = {'name': task['name'], 'worker': index, 'attempts': task['attempts']}
+                driver = None
+                try:
+                    driver = pool.acquire()
+                    result['result'] = task['scenario'](SeleniumLogic(driver))
+                    result['status'] = 'passed'
+                    pool.release(driver)
+                except Exception as e:
+                    lost = driver is None or self._session_lost(pool, driver, e)
+                    if driver is not None:
+                        pool.release(driver, broken=lost)
+                    if lost and task['attempts'] <= self._retries:
+                        logger.warning("Worker %s: session lost in %s, retry: %s", index, task['name'], e)
+                        with self._lock:
+                            self._queues[index].appendleft(task)
+                        continue
+                    result['status'] = 'failed'
+                    result['error'] = repr(e)
+                    logger.error("Worker %s: scenario %s failed: %s", index, task['name'], e)
+                result['seconds'] = perf_counter() - start
+                results[task['index']] = result
+        except Exception as e:
+            self._worker_errors[index] = repr(e)
+            logger.error("Worker %s crashed: %s", index, e)
+        finally:
+            try:
+                pool.close()
+            except Exception as e:
+                logger.warning("Worker %s: pool close error: %s", index, e)
+
+    def run(self, scenarios: list):
+        """
+        Run scenarios and wait for all of them
+        :param scenarios: list of callables or (callable, worker_index)
+        :return: list of result dicts (name, worker, status, result/error, attempts, seconds) in scenarios order
+        """
+        tasks = []
+        for i, scenario in enumerate(scenarios):
+            worker = None
+            if isinstance(scenario, tuple):
+                scenario, worker = scenario
+                if not isinstance(worker, int) or not 0 <= worker < len(self._workers):
+                    raise ValueError(f"Scenario {i} is pinned to worker {worker}, "
+                                     f"workers are 0..{len(self._workers) - 1}")
+            tasks.append({'index': i, 'scenario': scenario, 'worker': worker, 'attempts': 0,
+                          'name': getattr(scenario, '__name__', f'scenario_{i}')})
+        self._queues = [deque() for _ in self._workers]
+        self._worker_errors = {}
+        for task in tasks:
+            worker = task['worker'] if task['worker'] is not None else task['index'] % len(self._workers)
+            self._queues[worker].append(task)
+        results = [None] * len(scenarios)
+        threads = [threading.Thread(target=self._worker, args=(i, results), name=f'scenario_worker_{i}', daemon=True)
+                   for i in range(len(self._workers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for task in tasks:
+            if results[task['index']] is None:
+                error = self._worker_errors.get(task.get('runner', task['worker']))
+                results[task['index']] = {'name': task['name'], 'worker': task['worker'], 'status': 'not_run',
+                                          'attempts': task['attempts'],
+                                          'error': error or 'scenario was not finished: worker crashed'}
+        failed = [result for result in results if result['status'] != 'passed']
+        logger.info("Scenarios finished: %s passed, %s failed", len(results) - len(failed), len(failed))
+        return results
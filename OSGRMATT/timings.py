@@ -0,0 +1,68 @@
+import html
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimingCollector:
+    """
+    In-memory collector of APIBase request timings for current test.
+    Disabled by default, then APIBase does no timing work at all.
+    """
+    def __init__(self):
+        self.enabled = False
+        self._records = []
+        self._lock = threading.Lock()
+
+    def record(self, method: str, url: str, response, total: float, stream: bool = False):
+        """
+        :param method: str
+        :param url: str
+        :param response: requests.Response
+        :param total: float - seconds from send to body read (to headers for stream)
+        :param stream: bool - body not read yet, size is taken from Content-Length
+        """
+        body = response.request.body if response.request is not None else None
+        if stream:
+            response_size = int(response.headers.get('Content-Length', 0) or 0)
+        else:
+            response_size = len(response.content or b'')
+        record = {'method': method,
+                  'url': url,
+                  'status': response.status_code,
+                  'request_size': len(body) if body else 0,
+                  'response_size': response_size,
+                  'ttfb': response.elapsed.total_seconds(),
+                  'total': total}
+        with self._lock:
+            self._records.append(record)
+
+    def clear(self):
+        with self._lock:
+            self._records = []
+
+    def pop(self):
+        """Return collected records and start new collection"""
+        with self._lock:
+            records, self._records = self._records, []
+        return records
+
+    def to_html(self, records: list, slowest: int = 5):
+        """Latency table and slowest calls summary for pytest-html extras"""
+        def rows(items):
+            return ''.join(f"<tr><td>{item['method']}</td><td>{html.escape(item['url'])}</td>"
+                           f"<td>{item['status']}</td><td>{item['request_size']}</td>"
+                           f"<td>{item['response_size']}</td><td>{item['ttfb'] * 1000:.1f}</td>"
+                           f"<td>{item['total'] * 1000:.1f}</td></tr>" for item in items)
+
+        head = ("<tr><th>Method</th><th>Url</th><th>Status</th><th>Request, B</th><th>Response, B</th>"
+                "<th>TTFB, ms</th><th>Total, ms</th></tr>")
+        total = sum(item['total'] for item in records)
+        top = sorted(records, key=lambda item: item['total'], reverse=True)[:slowest]
+        return (f"<p>API calls: {len(records)}, total {total * 1000:.1f} ms</p>"
+                f"<p>Slowest calls</p><table>{head}{rows(top)}</table>"
+                f"<details><summary>All calls</summary><table>{head}{rows(records)}</table></details>")
+
+
+request_timings = RequestTimingCollector()
@@ -0,0 +1,126 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from time import time
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+logger = logging.getLogger(__name__)
+
+
+class FileLock:
+    """Exclusive inter-process lock on a file"""
+    def __init__(self, path):
+        self._path = Path(path)
+        self._file = None
+
+    def __enter__(self):
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self._path, 'a+')
+        if os.name == 'nt':
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if os.name == 'nt':
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+
+
+def get_jwt_exp(token: str):
+    """exp claim of JWT token or None if token isn't JWT"""
+    try:
+        payload = token.split(' ')[-1].split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload))['exp']
+        return float(exp)
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class TokenCache:
+    """
+    Auth tokens cache shared by processes (e.g. pytest workers) through a json file under file lock.
+    Token lives until JWT exp (minus skew), or ttl seconds for non-JWT tokens.
+    """
+    def __init__(self, path: str = None, ttl: float = 3600, skew: float = 30):
+        """
+        :param path: str - cache file, default osgrmatt_tokens.json in temp dir
+        :param ttl: float - lifetime of non-JWT tokens, seconds
+        :param skew: float - token is treated as expired skew seconds earlier
+        """
+        self._path = Path(path) if path else Path(tempfile.gettempdir()) / 'osgrmatt_tokens.json'
+        self._lock_path = self._path.with_name(self._path.name + '.lock')
+        self._ttl = ttl
+        self._skew = skew
+
+    def _key(self, auth_url: str, account: str):
+        return hashlib.sha256(f'{auth_url}|{account}'.encode()).hexdigest()
+
+    def _read(self):
+        try:
+            with open(self._path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, json.decoder.JSONDecodeError):
+            return {}
+
+    def _write(self, data: dict):
+        tmp_path = self._path.with_name(self._path.name + f'.{os.getpid()}.tmp')
+        with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(tmp_path, self._path)
+
+    def _valid(self, entry: dict):
+        return entry is not None and entry['expires'] - self._skew > time()
+
+    def get(self, auth_url: str, account: str):
+        """Cached token or None"""
+        with FileLock(self._lock_path):
+            entry = self._read().get(self._key(auth_url, account))
+        return entry['token'] if self._valid(entry) else None
+
+    def get_or_fetch(self, auth_url: str, account: str, fetch):
+        """
+        Cached token, or token from fetch() which is stored to cache.
+        Lock is held during fetch, so parallel workers wait for one login instead of doing their own.
+        :return: (token, from_cache)
+        """
+        key = self._key(auth_url, account)
+        with FileLock(self._lock_path):
+            data = self._read()
+            entry = data.get(key)
+            if self._valid(entry):
+                logger.info("Token for %s taken from cache", account)
+                return entry['token'], True
+            token = fetch()
+            expires = get_jwt_exp(token) or time() + self._ttl
+            data = {k: v for k, v in data.items() if self._valid(v)}
+            data[key] = {'token': token, 'expires': expires}
+            self._write(data)
+        return token, False
+
+    def invalidate(self, auth_url: str, account: str, token: str = None):
+        """Remove token from cache. With token - only if cached token is the same"""
+        key = self._key(auth_url, account)
+        with FileLock(self._lock_path):
+            data = self._read()
+            entry = data.get(key)
+            if entry is not None and (token is None or entry['token'] == token):
+                data.pop(key)
+                self._write(data)
+                logger.info("Token for %s invalidated", account)
@@ -2,9 +2,12 @@ import json
 import logging
 from time import sleep
 import sys
+import weakref
 from datetime import datetime
 import hashlib
 from typing import Union
+from OSGRMATT.network import get_network_index
+from OSGRMATT.perflog import get_collector
 
 
 logger = logging.getLogger(__name__)
@@ -22,8 +25,7 @@ def check_requests(driver):
     Если у запроса ответ не 200 или 204, кладет в лог урл и статус
     """
     statuses = [200, 204, 304]
-    for performance_data in driver.get_log('performance'):
-        requests_json = process_browser_log_entry(performance_data)
+    for requests_json in get_collector(driver).read('check_requests', 'Network.responseReceived'):
         if requests_json["method"] == "Network.responseReceived":
             if requests_json["params"]["response"]["status"] in statuses:
                 pass
@@ -53,36 +55,26 @@ def screencast_needed():
         return False
 
 
+_response_data_cursors = weakref.WeakKeyDictionary()
+
+
 def get_response_data(driver, url: str, wait: int = None):
-    """Функция для логгирования ответа от эндпойнта, url которого передаем аргументом"""
+    """Функция для логгирования ответа от эндпойнта, url которого передаем аргументом.
+    Логгируются только ответы, полученные после прошлого вызова для этого драйвера"""
     logger.info("Try to get response data for endpoint %s", url)
     if wait:
         sleep(wait)
-    browser_log = driver.get_log('performance')
-    events = [process_browser_log_entry(entry) for entry in browser_log]
-    events = [event for event in events if 'Network.response' in event['method']]
-    tmp_event_list = []
-    event_list = []
-    for event in events:
-        try:
-            event_type = event['params']['type']
-        except Exception:
-            event_type = 'None'
-        if event_type == 'XHR':
-            tmp_event_list.append(event)
-    for event in tmp_event_list:
-        try:
-            event_url = event['params']['response']['url']
-        except Exception:
-            event_url = "None"
-        if url == event_url:
-            event_list.append(event)
+    index = get_network_index(driver)
+    index.update()
+    since = _response_data_cursors.get(driver, -1)
+    _response_data_cursors[driver] = index.last_seq
+    event_list = [record for record in index.find(url=url, resource_type='XHR', update=False)
+                  if record['response_seq'] is not None and record['response_seq'] > since]
 
     if len(event_list) > 0:
-        for i in range(len(event_list)):
-            response = driver.execute_cdp_cmd('Network.getResponseBody',
-                                              {'requestId': event_list[i]["params"]["requestId"]})
-            logger.info("Endpoint's %s response: %s", url, response['body'])
+        bodies = index.fetch_bodies(event_list)
+        for record in event_list:
+            logger.info("Endpoint's %s response: %s", url, bodies[record['requestId']])
     else:
         logger.error("Responses list is empty")
 
@@ -104,12 +96,16 @@ def get_used_memory(driver):
     return driver.execute_script("""var mem = window.performance.memory.usedJSHeapSize /  1048576; return mem;""")
 
 
-def to_hash(data: str, algorithm: Union[str, bytes]):
-    """Вычисление хэша данных с указанием алгоритма при помощи библиотеки hashlib."""
+def get_hash_generator(algorithm: Union[str, bytes]):
+    """Объект hashlib для алгоритма, для инкрементального вычисления хэша через update()."""
     try:
-        hash_generator = getattr(hashlib, algorithm)()
+        return getattr(hashlib, algorithm)()
     except AttributeError:
         raise AttributeError("Not supported algorithm. Supported only: sha1, sha256, sha512")
 
+
+def to_hash(data: str, algorithm: Union[str, bytes]):
+    """Вычисление хэша данных с указанием алгоритма при помощи библиотеки hashlib."""
+    hash_generator = get_hash_generator(algorithm)
     hash_generator.update(data.encode())
     return hash_generator.hexdigest()
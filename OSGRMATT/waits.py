@@ -0,0 +1,199 @@
+import logging
+from time import perf_counter
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+logger = logging.getLogger(__name__)
+
+# JS locator for (By, value) pairs, shared by in-browser scripts
+JS_FIND = """
+var osgrmattFind = function (by, value) {
+    var quote = function (text) { return '"' + String(text).replace(/\\\\/g, '\\\\\\\\').replace(/"/g, '\\\\"') + '"'; };
+    var all = function (selector) { return Array.prototype.slice.call(document.querySelectorAll(selector)); };
+    switch (by) {
+        case 'xpath':
+            var snapshot = document.evaluate(value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            var nodes = [];
+            for (var i = 0; i < snapshot.snapshotLength; i++) { nodes.push(snapshot.snapshotItem(i)); }
+            return nodes;
+        case 'id': return all('[id=' + quote(value) + ']');
+        case 'name': return all('[name=' + quote(value) + ']');
+        case 'class name': return all('.' + CSS.escape(value));
+        case 'tag name': return all(value);
+        case 'link text': return all('a').filter(function (a) { return a.textContent.trim() === value; });
+        case 'partial link text': return all('a').filter(function (a) { return a.textContent.indexOf(value) !== -1; });
+        default: return all(value);
+    }
+};
+var osgrmattVisible = function (element) {
+    if (!element.isConnected) { return false; }
+    var style = window.getComputedStyle(element);
+    if (style.visibility === 'hidden' || style.visibility === 'collapse' || style.display === 'none') { return false; }
+    var rect = element.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0 && parseFloat(style.opacity) > 0;
+};
+"""
+
+_JS_WAIT = JS_FIND + """
+var by = arguments[0], value = arguments[1], condition = arguments[2], timeout = arguments[3];
+var done = arguments[arguments.length - 1];
+var check = function () {
+    var elements = osgrmattFind(by, value);
+    switch (condition) {
+        case 'presence': return elements.length ? elements[0] : null;
+        case 'all_presence': return elements.length ? elements : null;
+        case 'visibility': return elements.length && osgrmattVisible(elements[0]) ? elements[0] : null;
+        case 'all_visibility':
+            return elements.length && elements.every(osgrmattVisible) ? elements : null;
+        case 'invisibility': return !elements.length || !osgrmattVisible(elements[0]) ? true : null;
+        case 'clickable':
+            return elements.length && osgrmattVisible(elements[0]) && !elements[0].disabled ? elements[0] : null;
+    }
+    return null;
+};
+var result = check();
+if (result) { done(result); return; }
+var finished = false, scheduled = false, observer, timer, poll;
+var finish = function (value) {
+    if (finished) { return; }
+    finished = true;
+    observer.disconnect();
+    clearTimeout(timer);
+    clearInterval(poll);
+    done(value);
+};
+var schedule = function () {
+    if (scheduled || finished) { return; }
+    scheduled = true;
+    requestAnimationFrame(function () {
+        scheduled = false;
+        var value = check();
+        if (value) { finish(value); }
+    });
+};
+observer = new MutationObserver(schedule);
+observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+// rAF is paused in background tabs and styles can change without mutations (css transitions)
+poll = setInterval(function () { var value = check(); if (value) { finish(value); } }, 250);
+timer = setTimeout(function () { finish(null); }, timeout);
+"""
+
+JS_INSPECT = JS_FIND + """
+var locators = arguments[0], attributes = arguments[1];
+return locators.map(function (locator) {
+    var elements = osgrmattFind(locator[0], locator[1]);
+    var element = elements[0];
+    if (!element) {
+        return {present: false, visible: false, count: 0, text: null, attributes: {}, element: null};
+    }
+    var values = {};
+    attributes.forEach(function (name) { values[name] = element.getAttribute(name); });
+    var visible = osgrmattVisible(element);
+    return {present: true, visible: visible, count: elements.length,
+            text: visible ? element.innerText : element.textContent, attributes: values, element: element};
+});
+"""
+
+_FALLBACK_CONDITIONS = {'presence': EC.presence_of_element_located,
+                        'all_presence': EC.presence_of_all_elements_located,
+                        'visibility': EC.visibility_of_element_located,
+                        'all_visibility': EC.visibility_of_all_elements_located,
+                        'invisibility': EC.invisibility_of_element_located,
+                        'clickable': EC.element_to_be_clickable}
+
+
+class WaitPolicy:
+    """Named wait timeouts (seconds) and polling settings for SeleniumLogic"""
+    def __init__(self, instant: float = 1, short: float = 3, fast: float = 5, default: float = 30,
+                 slow: float = 180, poll_frequency: float = 0.1, event_driven: bool = True):
+        """
+        :param instant, short, fast, default, slow: float - named timeouts
+        :param poll_frequency: float - polling interval of fallback WebDriverWait
+        :param event_driven: bool - resolve waits in browser with MutationObserver, polling only as fallback
+        """
+        self.timeouts = {'instant': instant, 'short': short, 'fast': fast, 'default': default, 'slow': slow}
+        self.poll_frequency = poll_frequency
+        self.event_driven = event_driven
+
+    def timeout(self, timeout=None):
+        """Timeout by name or number, default timeout if None"""
+        if timeout is None:
+            return self.timeouts['default']
+        if isinstance(timeout, str):
+            return self.timeouts[timeout]
+        return timeout
+
+
+class WaitEngine:
+    """
+    Waits resolved inside the browser: execute_async_script calls which return as soon as
+    MutationObserver/requestAnimationFrame sees the condition. Long waits are split into several calls
+    to stay within driver script timeout. Falls back to WebDriverWait polling for the rest of the timeout
+    when script can't be used (e.g. page navigated during the wait).
+    """
+    _SCRIPT_TIMEOUT_MARGIN = 5
+    _DEFAULT_SCRIPT_TIMEOUT = 30
+
+    def __init__(self, driver, policy: WaitPolicy = None):
+        self._driver = driver
+        self._policy = policy or WaitPolicy()
+        self._script_timeout = None
+
+    @property
+    def policy(self):
+        return self._policy
+
+    def _driver_script_timeout(self):
+        """Script timeout of driver, read once"""
+        if self._script_timeout is None:
+            try:
+                self._script_timeout = self._driver.timeouts.script
+            except (AttributeError, WebDriverException):
+                self._script_timeout = self._DEFAULT_SCRIPT_TIMEOUT
+        return self._script_timeout
+
+    def _script_chunk(self):
+        """Longest wait (seconds) one script can take within driver script timeout"""
+        script_timeout = self._driver_script_timeout()
+        if not script_timeout:
+            return None
+        return max(script_timeout - self._SCRIPT_TIMEOUT_MARGIN, script_timeout / 2)
+
+    def _wait_script(self, deadline: float, by, value, condition: str):
+        """
+        Wait script in chunks shorter than driver script timeout, so the timeout is never changed.
+        Waits up to the chunk take one execute_async_script call
+        """
+        chunk = self._script_chunk()
+        while True:
+            left = max(deadline - perf_counter(), 0)
+            step = left if chunk is None else min(left, chunk)
+            result = self._driver.execute_async_script(_JS_WAIT, by, value, condition, int(step * 1000))
+            if result or step >= left:
+                return result
+
+    def until(self, condition: str, by, value, timeout=None):
+        """
+        Wait for condition of (by, value)
+        :param condition: str - presence, all_presence, visibility, all_visibility, invisibility, clickable
+        :param timeout: seconds or policy timeout name
+        :return: element, list of elements or True for invisibility. Raises TimeoutException
+        """
+        timeout = self._policy.timeout(timeout)
+        deadline = perf_counter() + timeout
+        if self._policy.event_driven:
+            try:
+                result = self._wait_script(deadline, by, value, condition)
+            except TimeoutException:
+                raise
+            except WebDriverException as e:
+                logger.debug("Event driven wait of %s %s failed, fallback to polling: %s", by, value, e)
+            else:
+                if result:
+                    return result
+                raise TimeoutException(f"{condition} of {by}={value} wasn't reached in {timeout} s")
+        # after failed script only the rest of the timeout is left for polling
+        left = max(deadline - perf_counter(), 0)
+        return WebDriverWait(self._driver, left, poll_frequency=self._policy.poll_frequency).until(
+            _FALLBACK_CONDITIONS[condition]((by, value)))
@@ -0,0 +1,196 @@
+import json
+import logging
+import re
+import threading
+from collections import deque
+from time import perf_counter
+from selenium.common.exceptions import TimeoutException
+from OSGRMATT.perflog import get_collector
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def _json_path(payload: str, path: str):
+    """Value by dotted path ('data.items.0.id') in JSON payload or _MISSING"""
+    try:
+        value = json.loads(payload)
+    except ValueError:
+        return _MISSING
+    for key in path.split('.'):
+        if isinstance(value, dict) and key in value:
+            value = value[key]
+        elif isinstance(value, list) and key.lstrip('-').isdigit() and -len(value) <= int(key) < len(value):
+            value = value[int(key)]
+        else:
+            return _MISSING
+    return value
+
+
+def _frame_size(payload: str, opcode):
+    """Frame size in bytes: UTF-8 text, base64 decoded length for binary frames (opcode 2)"""
+    if opcode == 2:
+        payload = payload.rstrip()
+        return len(payload) * 3 // 4 - (len(payload) - len(payload.rstrip('=')))
+    return len(payload.encode())
+
+
+def frame_filter(regex: str = None, path: str = None, value=_MISSING, direction: str = None, url: str = None):
+    """
+    Predicate for frames
+    :param regex: str - payload regex (search)
+    :param path: str - dotted JSON path, frame matches if it exists (or equals value)
+    :param value: expected value by path
+    :param direction: str - 'sent' or 'received'
+    :param url: str - socket url substring
+    """
+    pattern = re.compile(regex) if regex is not None else None
+
+    def match(frame: dict):
+        if direction is not None and frame['direction'] != direction:
+            return False
+        if url is not None and url not in (frame['url'] or ''):
+            return False
+        if pattern is not None and not pattern.search(frame['payload']):
+            return False
+        if path is not None:
+            found = _json_path(frame['payload'], path)
+            if found is _MISSING or (value is not _MISSING and found != value):
+                return False
+        return True
+
+    return match
+
+
+class WebSocketCapture:
+    """
+    WebSocket frames of driver by connection, taken from Network.webSocket* performance log events.
+    Every connection keeps last max_frames frames and counters for frames/sec and bytes/sec stats.
+    wait_for checks new frames only as they are drained from the log. Needs goog:loggingPrefs performance log.
+    """
+    def __init__(self, driver, max_frames: int = 1000, poll_interval: float = 0.05):
+        """
+        :param driver: webdriver
+        :param max_frames: int - frames kept per connection
+        :param poll_interval: float - seconds between log drains in wait_for
+        """
+        self._max_frames = max_frames
+        self._poll_interval = poll_interval
+        self.connections = {}
+        self._waiters = []
+        self._lock = threading.Lock()
+        self._collector = get_collector(driver)
+        self._collector.subscribe(self._on_event, 'Network.webSocket')
+
+    def _connection(self, request_id: str, url: str = None):
+        connection = self.connections.get(request_id)
+        if connection is None:
+            connection = self.connections[request_id] = {'url': url, 'opened': None, 'closed': None,
+                                                         'frames': deque(maxlen=self._max_frames),
+                                                         'sent': 0, 'received': 0, 'bytes': 0,
+                                                         'first': None, 'last': None}
+        return connection
+
+    def _on_event(self, event: dict):
+        params = event['params']
+        method = event['method']
+        with self._lock:
+            connection = self._connection(params['requestId'], params.get('url'))
+            if method == 'Network.webSocketCreated':
+                connection['url'] = params['url']
+            elif method == 'Network.webSocketHandshakeResponseReceived':
+                connection['opened'] = params['timestamp']
+            elif method == 'Network.webSocketClosed':
+                connection['closed'] = params['timestamp']
+            elif method in ('Network.webSocketFrameSent', 'Network.webSocketFrameReceived'):
+                direction = 'sent' if method == 'Network.webSocketFrameSent' else 'received'
+                payload = params['response']['payloadData']
+                opcode = params['response'].get('opcode')
+                frame = {'url': connection['url'], 'requestId': params['requestId'], 'direction': direction,
+                         'timestamp': params['timestamp'], 'opcode': opcode,
+                         'payload': payload, 'size': _frame_size(payload, opcode)}
+                connection['frames'].append(frame)
+                connection[direction] += 1
+                connection['bytes'] += frame['size']
+                if connection['first'] is None:
+                    connection['first'] = frame['timestamp']
+                connection['last'] = frame['timestamp']
+                for waiter in self._waiters:
+                    if waiter['frame'] is None and waiter['match'](frame):
+                        waiter['frame'] = frame
+                        waiter['event'].set()
+
+    def update(self):
+        """Take new events from performance log"""
+        self._collector.drain()
+
+    def frames(self, update: bool = True, **filters):
+        """Captured frames matching filters (see frame_filter), oldest first per connection"""
+        if update:
+            self.update()
+        match = frame_filter(**filters)
+        with self._lock:
+            return [frame for connection in self.connections.values() for frame in connection['frames']
+                    if match(frame)]
+
+    def wait_for(self, timeout_ms: int = 5000, captured: bool = False, **filters):
+        """
+        Wait for frame matching filters (see frame_filter), e.g. wait_for(500, path='type', value='pong')
+        :param timeout_ms: int - max wait time
+        :param captured: bool - frames captured before the call also match
+        :return: frame dict
+        """
+        match = frame_filter(**filters)
+        waiter = {'match': match, 'frame': None, 'event': threading.Event()}
+        with self._lock:
+            if captured:
+                for connection in self.connections.values():
+                    for frame in connection['frames']:
+                        if match(frame):
+                            return frame
+            self._waiters.append(waiter)
+        deadline = perf_counter() + timeout_ms / 1000
+        try:
+            while not waiter['event'].is_set():
+                self.update()
+                left = deadline - perf_counter()
+                if left <= 0:
+                    break
+                waiter['event'].wait(min(self._poll_interval, left))
+        finally:
+            with self._lock:
+                self._waiters.remove(waiter)
+        if waiter['frame'] is None:
+            raise TimeoutException(f"No WebSocket frame matching {filters} in {timeout_ms} ms")
+        return waiter['frame']
+
+    def stats(self, update: bool = True):
+        """Frames, bytes, frames/sec and bytes/sec by socket url (rates over first..last frame time)"""
+        if update:
+            self.update()
+        stats = {}
+        with self._lock:
+            for request_id, connection in self.connections.items():
+                frames = connection['sent'] + connection['received']
+                duration = (connection['last'] or 0) - (connection['first'] or 0)
+                stats[f"{connection['url']} ({request_id})"] = {
+                    'sent': connection['sent'], 'received': connection['received'], 'bytes': connection['bytes'],
+                    'frames_per_sec': round(frames / duration, 2) if duration > 0 else None,
+                    'bytes_per_sec': round(connection['bytes'] / duration, 2) if duration > 0 else None,
+                    'closed': connection['closed'] is not None}
+        return stats
+
+    def clear(self):
+        """Forget captured frames and counters"""
+        with self._lock:
+            self.connections.clear()
+
+    def close(self):
+        self._collector.unsubscribe(self._on_event)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
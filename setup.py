@@ -23,6 +23,7 @@ setup(
         'pytest==7.4.3',
         'pytest-html==4.1.1',
         'requests==2.31.0',
+        'aiohttp==3.9.1',
         'selenium==4.15.2',
         'webdriver-manager==4.0.1',
         'SQLAlchemy==2.0.23',
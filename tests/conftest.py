@@ -0,0 +1,125 @@
+import json
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+
+class FakeGrid:
+    """
+    Grid with one node of max_sessions chrome slots: /status, W3C new/delete session and the session commands
+    used by DriverPool and scenarios (windows, navigation, title, sync scripts, cookies)
+    """
+    stereotype = {'browserName': 'chrome', 'browserVersion': '131.0', 'platformName': 'linux'}
+
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.requested = []
+        self.max_concurrent = 0
+        self.lock = threading.Lock()
+
+    def status(self):
+        with self.lock:
+            sessions = list(self.sessions)
+        slots = [{'stereotype': self.stereotype, 'session': {'sessionId': sessions[i]} if i < len(sessions) else None}
+                 for i in range(self.max_sessions)]
+        return {'value': {'ready': True, 'nodes': [{'availability': 'UP', 'maxSessions': self.max_sessions,
+                                                     'slots': slots}]}}
+
+    def new_session(self, payload: dict):
+        capabilities = payload['capabilities']['alwaysMatch']
+        with self.lock:
+            self.requested.append(capabilities)
+            if len(self.sessions) >= self.max_sessions:
+                return 500, {'value': {'error': 'session not created', 'message': 'no free slot', 'stacktrace': ''}}
+            session_id = uuid.uuid4().hex
+            self.sessions[session_id] = {'capabilities': capabilities, 'handles': ['tab-0'], 'current': 'tab-0',
+                                         'urls': {'tab-0': 'about:blank'}, 'commands': 0}
+            self.max_concurrent = max(self.max_concurrent, len(self.sessions))
+        return 200, {'value': {'sessionId': session_id, 'capabilities': dict(capabilities, **self.stereotype)}}
+
+    def delete_session(self, session_id: str):
+        with self.lock:
+            self.sessions.pop(session_id, None)
+        return 200, {'value': None}
+
+    def command(self, method: str, session_id: str, command: str, payload: dict):
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return 404, {'value': {'error': 'invalid session id', 'message': session_id, 'stacktrace': ''}}
+            session['commands'] += 1
+            current = session['current']
+            if (method, command) == ('GET', 'window/handles'):
+                return 200, {'value': list(session['handles'])}
+            if (method, command) == ('GET', 'window'):
+                return 200, {'value': current}
+            if (method, command) == ('POST', 'window'):
+                session['current'] = payload['handle']
+                return 200, {'value': None}
+            if (method, command) == ('DELETE', 'window'):
+                session['handles'].remove(current)
+                return 200, {'value': list(session['handles'])}
+            if (method, command) == ('POST', 'window/new'):
+                handle = f'tab-{uuid.uuid4().hex[:8]}'
+                session['handles'].append(handle)
+                session['urls'][handle] = 'about:blank'
+                return 200, {'value': {'handle': handle, 'type': 'tab'}}
+            if (method, command) == ('POST', 'url'):
+                session['urls'][current] = payload['url']
+                return 200, {'value': None}
+            if (method, command) == ('GET', 'url'):
+                return 200, {'value': session['urls'][current]}
+            if (method, command) == ('GET', 'title'):
+                return 200, {'value': session['urls'][current].rsplit('/', 1)[-1]}
+            if (method, command) == ('POST', 'execute/sync'):
+                return 200, {'value': 1 if payload['script'].strip() == 'return 1;' else None}
+            if (method, command) == ('DELETE', 'cookie'):
+                return 200, {'value': None}
+        return 404, {'value': {'error': 'unknown command', 'message': f'{method} {command}', 'stacktrace': ''}}
+
+
+@pytest.fixture
+def fake_grid():
+    grid = FakeGrid(max_sessions=2)
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, data: dict):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _payload(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length)) if length else {}
+
+        def _route(self):
+            payload = self._payload()
+            path = self.path.rstrip('/')
+            if path == '/status':
+                return self._reply(200, grid.status())
+            if path == '/session' and self.command == 'POST':
+                return self._reply(*grid.new_session(payload))
+            match = re.fullmatch(r'/session/(\w+)(?:/(.+))?', path)
+            if match is None:
+                return self._reply(404, {'value': {'error': 'unknown command', 'message': path, 'stacktrace': ''}})
+            session_id, command = match.groups()
+            if command is None and self.command == 'DELETE':
+                return self._reply(*grid.delete_session(session_id))
+            self._reply(*grid.command(self.command, session_id, command or '', payload))
+
+        do_GET = do_POST = do_DELETE = _route
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield grid, f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
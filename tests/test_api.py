@@ -0,0 +1,314 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+import pytest
+from OSGRMATT.api import APIBase, AsyncAPIBase
+from OSGRMATT.cassette import Cassette
+from OSGRMATT.token_cache import TokenCache
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    """Returns request Authorization and Cookie headers, /login sets session cookie"""
+    def do_GET(self):
+        body = json.dumps({'authorization': self.headers.get('Authorization'),
+                           'cookie': self.headers.get('Cookie')}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if self.path == '/login':
+            self.send_header('Set-Cookie', 'sid=abc; Path=/')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def echo_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+    server.server_close()
+
+
+def test_concurrent_mode_no_header_bleed(echo_url):
+    api = APIBase()
+    api.configure_session(pool_maxsize=32)
+    api.enable_concurrent_mode()
+    start = threading.Barrier(32)
+
+    def worker(index):
+        token = f'Bearer token-{index}'
+        api._headers['Authorization'] = token
+        start.wait()
+        seen = [api._get(echo_url)['authorization'] for _ in range(20)]
+        api.logout()
+        return token, seen
+
+    with api, ThreadPoolExecutor(max_workers=32) as executor:
+        results = list(executor.map(worker, range(32)))
+    for token, seen in results:
+        assert seen == [token] * 20
+    assert 'Authorization' not in api.headers
+
+
+def test_server_cookies_are_not_kept(echo_url):
+    with APIBase() as api:
+        api._get(f'{echo_url}login')
+        assert api._get(echo_url)['cookie'] is None
+        assert api._request('GET', echo_url, cookies={'sid': 'own'}).json()['cookie'] == 'sid=own'
+
+
+def test_session_created_once_under_concurrency(monkeypatch):
+    api = APIBase()
+    api.enable_concurrent_mode()
+    created = []
+    create_session = APIBase._create_session
+
+    def counting_create_session(self):
+        created.append(threading.get_ident())
+        sleep(0.05)
+        return create_session(self)
+
+    monkeypatch.setattr(APIBase, '_create_session', counting_create_session)
+    start = threading.Barrier(16)
+
+    def worker(_):
+        start.wait()
+        return api.session
+
+    with api, ThreadPoolExecutor(max_workers=16) as executor:
+        sessions = list(executor.map(worker, range(16)))
+    assert len(created) == 1
+    assert all(session is sessions[0] for session in sessions)
+
+
+class AuthHandler(BaseHTTPRequestHandler):
+    """/login gives new token for right password, /data accepts only the last issued token"""
+    logins = 0
+    valid_token = None
+
+    def _reply(self, status: int, data: dict):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        credentials = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if credentials['password'] != 'secret':
+            return self._reply(401, {'error': 'bad password'})
+        AuthHandler.logins += 1
+        AuthHandler.valid_token = f'Bearer token-{AuthHandler.logins}'
+        self._reply(200, {'token': AuthHandler.valid_token})
+
+    def do_GET(self):
+        if self.headers.get('Authorization') != AuthHandler.valid_token:
+            return self._reply(401, {'error': 'unauthorized'})
+        self._reply(200, {'ok': True})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def auth_api(tmp_path):
+    AuthHandler.logins = 0
+    AuthHandler.valid_token = None
+    server = ThreadingHTTPServer(('127.0.0.1', 0), AuthHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    (tmp_path / 'response_jsons').mkdir()
+
+    class API(APIBase):
+        _BASE_DIR = tmp_path
+
+    api = API()
+    api.enable_token_cache(TokenCache(tmp_path / 'tokens.json'))
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    api.auth(f'{base_url}/login', 'user@test', 'secret', 'token')
+    with api:
+        yield api, base_url
+    server.shutdown()
+    server.server_close()
+
+
+def test_reauth_when_fresh_login_token_is_rejected(auth_api):
+    api, base_url = auth_api
+    AuthHandler.valid_token = 'Bearer revoked-elsewhere'
+    assert api._get(f'{base_url}/data') == {'ok': True}
+    assert AuthHandler.logins == 2
+
+
+def test_no_reauth_for_foreign_credentials(auth_api):
+    api, base_url = auth_api
+    api.auth(f'{base_url}/login', 'user@test', 'secret', 'token')
+    response = api._request('GET', f'{base_url}/data', headers=dict(api.headers, Authorization='Bearer forged'))
+    assert response.status_code == 401
+    assert AuthHandler.logins == 1
+    assert api._get(f'{base_url}/data') == {'ok': True}
+
+
+def test_no_reauth_for_failed_login(auth_api):
+    api, base_url = auth_api
+    api.auth(f'{base_url}/login', 'user@test', 'secret', 'token')
+    body = json.dumps({'email': 'user@test', 'password': 'wrong'})
+    assert '401' in api._post(f'{base_url}/login', body, return_error=True)
+    assert AuthHandler.logins == 1
+
+
+class AsyncHandler(BaseHTTPRequestHandler):
+    """/flaky answers 503 to the first `failures` requests, /slow counts concurrent requests"""
+    failures = 0
+    requests = []
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def _reply(self, status: int, data: dict):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        with AsyncHandler.lock:
+            AsyncHandler.requests.append((self.command, self.path, body))
+            if self.path == '/flaky' and AsyncHandler.failures:
+                AsyncHandler.failures -= 1
+                return self._reply(503, {'error': 'unavailable'})
+            AsyncHandler.active += 1
+            AsyncHandler.max_active = max(AsyncHandler.max_active, AsyncHandler.active)
+        if self.path.startswith('/slow'):
+            sleep(0.1)
+        with AsyncHandler.lock:
+            AsyncHandler.active -= 1
+        self._reply(200, {'path': self.path, 'size': len(body)})
+
+    do_GET = do_POST = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def async_url():
+    AsyncHandler.failures = 0
+    AsyncHandler.requests = []
+    AsyncHandler.max_active = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), AsyncHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def async_api(tmp_path, **settings):
+    (tmp_path / 'test_data').mkdir(exist_ok=True)
+    (tmp_path / 'test_data' / 'upload.bin').write_bytes(b'x' * 1000)
+
+    class API(AsyncAPIBase):
+        _BASE_DIR = tmp_path
+
+    return API(**settings)
+
+
+def test_async_get(async_url, tmp_path):
+    async def run():
+        async with async_api(tmp_path) as api:
+            return await api.get(f'{async_url}/data')
+
+    assert asyncio.run(run()) == {'path': '/data', 'size': 0}
+
+
+def test_async_gather_limit(async_url, tmp_path):
+    async def run():
+        async with async_api(tmp_path) as api:
+            return await api.gather(*(api.get(f'{async_url}/slow/{i}') for i in range(12)), limit=3)
+
+    results = asyncio.run(run())
+    assert [result['path'] for result in results] == [f'/slow/{i}' for i in range(12)]
+    assert AsyncHandler.max_active == 3
+
+
+def test_async_retries_only_idempotent_requests(async_url, tmp_path):
+    async def run():
+        async with async_api(tmp_path, retries=3) as api:
+            AsyncHandler.failures = 2
+            get = await api.get(f'{async_url}/flaky')
+            AsyncHandler.failures = 1
+            post = await api.post(f'{async_url}/flaky', '{}', return_error=True)
+            return get, post
+
+    get, post = asyncio.run(run())
+    assert get['path'] == '/flaky'
+    assert '503' in post
+    assert [command for command, _, _ in AsyncHandler.requests] == ['GET'] * 3 + ['POST']
+
+
+def test_async_send_file_retry(async_url, tmp_path):
+    AsyncHandler.failures = 2
+
+    async def run():
+        async with async_api(tmp_path, retries=3) as api:
+            return await api.send_file(f'{async_url}/flaky', 'upload.bin', retry=True)
+
+    assert asyncio.run(run())['path'] == '/flaky'
+    uploads = [body for command, _, body in AsyncHandler.requests]
+    assert len(uploads) == 3
+    assert all(b'x' * 1000 in body for body in uploads)
+
+
+class DownloadHandler(BaseHTTPRequestHandler):
+    """Streams 3 chunks of 1 MB, counts requests"""
+    requests = 0
+
+    def do_GET(self):
+        DownloadHandler.requests += 1
+        self.send_response(200)
+        self.send_header('Content-Length', str(3 * 1024 * 1024))
+        self.end_headers()
+        for i in range(3):
+            self.wfile.write(bytes([i]) * 1024 * 1024)
+            self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_streamed_download_is_recorded_and_replayed(tmp_path, monkeypatch):
+    DownloadHandler.requests = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), DownloadHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/file'
+    record = Cassette.record
+    buffered = []
+
+    def checking_record(self, method, url, response, *args, **kwargs):
+        record(self, method, url, response, *args, **kwargs)
+        buffered.append(response._content is not False)
+
+    monkeypatch.setattr(Cassette, 'record', checking_record)
+    with APIBase() as api:
+        api.use_cassette(Cassette(tmp_path / 'cassette.jsonl.gz', mode=Cassette.RECORD))
+        recorded = api._download(url, tmp_path / 'recorded.bin', algorithm='sha256', chunk_size=64 * 1024)
+    server.shutdown()
+    server.server_close()
+    with APIBase() as api:
+        api.use_cassette(Cassette(tmp_path / 'cassette.jsonl.gz', mode=Cassette.REPLAY))
+        replayed = api._download(url, tmp_path / 'replayed.bin', algorithm='sha256')
+    assert buffered == [False]
+    assert DownloadHandler.requests == 1
+    assert recorded['size'] == replayed['size'] == 3 * 1024 * 1024
+    assert recorded['hash'] == replayed['hash']
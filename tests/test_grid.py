@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+from OSGRMATT.browser import Browser
+from OSGRMATT.grid import GridClient
+
+
+def test_grid_session_without_cloud_options(fake_grid):
+    grid, url = fake_grid
+    driver = Browser().setup_driver(command_executor=url, grid_client=GridClient(url))
+    driver.quit()
+    capabilities = grid.requested[0]
+    assert 'cloud:options' not in capabilities
+    assert capabilities['browserVersion'] == grid.stereotype['browserVersion']
+    assert capabilities['platformName'] == grid.stereotype['platformName']
+
+
+def test_cloud_options_are_sent_when_given(fake_grid):
+    grid, url = fake_grid
+    Browser().setup_driver(command_executor=url, cloud_options={'build': 'b1'}).quit()
+    assert grid.requested[0]['cloud:options'] == {'build': 'b1'}
+
+
+def test_grid_client_admits_no_more_sessions_than_free_slots(fake_grid):
+    grid, url = fake_grid
+    client = GridClient(url, poll_interval=0.05, timeout=30)
+
+    def session(_):
+        driver = Browser().setup_driver(command_executor=url, grid_client=client)
+        sleep(0.2)
+        driver.quit()
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        list(executor.map(session, range(6)))
+    assert len(grid.requested) == 6
+    assert grid.max_concurrent == 2
+    assert client.metrics()['sessions'] == 6
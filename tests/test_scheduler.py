@@ -0,0 +1,163 @@
+import itertools
+import shutil
+import threading
+import pytest
+from selenium.common.exceptions import InvalidSessionIdException
+from selenium.webdriver import ChromeOptions
+from OSGRMATT.browser import Browser
+from OSGRMATT.scheduler import ScenarioScheduler
+
+GRID = 'http://grid.test:4444'
+_session_ids = itertools.count(1)
+
+
+class GridSession:
+    """Stand-in for remote driver of Grid node: only what DriverPool and SeleniumLogic use"""
+    def __init__(self, executor):
+        self.executor = executor
+        self.session_id = f'session-{next(_session_ids)}'
+        self.alive = True
+        self.handles = ['tab-0']
+        self.current = 'tab-0'
+        self.switch_to = self
+
+    def window(self, handle):
+        self.current = handle
+
+    def new_window(self, kind):
+        self.current = f'tab-{len(self.handles)}-{self.session_id}'
+        self.handles.append(self.current)
+
+    @property
+    def window_handles(self):
+        self._check()
+        return list(self.handles)
+
+    @property
+    def current_window_handle(self):
+        return self.current
+
+    def _check(self):
+        if not self.alive:
+            raise InvalidSessionIdException('invalid session id')
+
+    def execute_script(self, script, *args):
+        self._check()
+        return 1
+
+    def close(self):
+        self.handles.remove(self.current)
+
+    def delete_all_cookies(self):
+        pass
+
+    def quit(self):
+        self.alive = False
+
+
+@pytest.fixture
+def grid_sessions():
+    sessions = []
+    lock = threading.Lock()
+
+    def factory(executor):
+        session = GridSession(executor)
+        with lock:
+            sessions.append(session)
+        return session
+
+    return sessions, factory
+
+
+def scenario(name):
+    def run(logic):
+        return name, logic.driver.executor, logic.driver.session_id
+    run.__name__ = name
+    return run
+
+
+def test_grid_scenarios_run_on_workers_and_pins_are_kept(grid_sessions):
+    sessions, factory = grid_sessions
+    scheduler = ScenarioScheduler(workers=[GRID, GRID, GRID], driver_factory=factory)
+    scenarios = [scenario(f's{i}') for i in range(9)] + [(scenario('pinned'), 2)]
+    results = scheduler.run(scenarios)
+    assert [result['status'] for result in results] == ['passed'] * 10
+    assert [result['result'][0] for result in results] == [f's{i}' for i in range(9)] + ['pinned']
+    assert results[-1]['worker'] == 2
+    assert all(result['result'][1] == GRID for result in results)
+    assert len(sessions) <= 3
+    assert not any(session.alive for session in sessions)
+
+
+def test_lost_session_is_retried_on_new_driver(grid_sessions):
+    _, factory = grid_sessions
+    calls = []
+
+    def flaky(logic):
+        calls.append(logic.driver.session_id)
+        if len(calls) == 1:
+            logic.driver.alive = False
+            raise InvalidSessionIdException('session deleted by grid')
+        return 'ok'
+
+    results = ScenarioScheduler(workers=[GRID], driver_factory=factory, retries=1).run([flaky])
+    assert results[0]['status'] == 'passed'
+    assert results[0]['attempts'] == 2
+    assert calls[0] != calls[1]
+
+
+def test_pin_out_of_range_is_rejected(grid_sessions):
+    _, factory = grid_sessions
+    with pytest.raises(ValueError, match='pinned to worker 2'):
+        ScenarioScheduler(workers=[GRID, GRID], driver_factory=factory).run([(scenario('s'), 2)])
+
+
+def test_tasks_of_crashed_worker_are_reported_not_run(grid_sessions, monkeypatch):
+    _, factory = grid_sessions
+    scheduler = ScenarioScheduler(workers=[GRID, GRID], driver_factory=factory)
+    next_task = scheduler._next
+
+    def crashing_next(index):
+        if index == 1:
+            raise RuntimeError('worker 1 is broken')
+        return next_task(index)
+
+    monkeypatch.setattr(scheduler, '_next', crashing_next)
+    results = scheduler.run([scenario('s0'), (scenario('pinned'), 1)])
+    assert results[0]['status'] == 'passed'
+    assert results[1]['status'] == 'not_run'
+    assert 'worker 1 is broken' in results[1]['error']
+
+
+def page(name):
+    def run(logic):
+        logic.driver.get(f'http://app.test/{name}')
+        return logic.driver.session_id, logic.driver.title
+    run.__name__ = name
+    return run
+
+
+def test_scenarios_on_fake_grid(fake_grid):
+    grid, url = fake_grid
+    results = ScenarioScheduler(workers=[url, url]).run([page(f'p{i}') for i in range(6)] + [(page('pinned'), 1)])
+    assert [result['status'] for result in results] == ['passed'] * 7
+    assert [result['result'][1] for result in results] == [f'p{i}' for i in range(6)] + ['pinned']
+    assert results[-1]['worker'] == 1
+    assert len(grid.requested) == len({result['result'][0] for result in results}) <= 2
+    assert not grid.sessions
+
+
+def headless_chrome(executor):
+    options = ChromeOptions()
+    options.add_argument('--headless=new')
+    return Browser().setup_driver(options, command_executor=executor)
+
+
+@pytest.mark.skipif(not (shutil.which('google-chrome') or shutil.which('chromium')), reason='Chrome is not installed')
+def test_local_chrome_scenarios():
+    def title(logic):
+        logic.driver.get('data:text/html,<title>osgrmatt</title>')
+        return logic.driver.title
+
+    results = ScenarioScheduler(workers=[None, None], driver_factory=headless_chrome).run([title, title, title])
+    assert [result['result'] for result in results] == ['osgrmatt'] * 3